@@ -0,0 +1,299 @@
+# Headless batch conversion of a directory (or glob) of .pdf/.docx files
+# into decks. Extraction and PPTX rendering run on a process pool; model
+# and image API calls run on a thread pool, so --io-workers bounds every
+# outside call the run makes. The stages overlap: one report can render
+# while the next ones are still being generated. Finished items are
+# appended to a JSON-lines manifest so an interrupted run picks up where it
+# stopped.
+#
+# Usage: python batch.py reports/ "archive/**/*.pdf" --output decks/
+#            [--slides 8] [--visuals] [--cpu-workers 4] [--io-workers 8]
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from utils.llm import LLM_CONCURRENCY
+
+
+EXTENSIONS = (".pdf", ".docx")
+MANIFEST_NAME = "manifest.jsonl"
+
+logger = logging.getLogger("batch")
+
+
+def find_documents(inputs):
+    paths = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                paths.update(os.path.join(root, name) for name in files)
+        else:
+            paths.update(glob.glob(pattern, recursive=True))
+    return sorted(os.path.abspath(path) for path in paths
+                  if path.lower().endswith(EXTENSIONS) and os.path.isfile(path))
+
+
+def fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def load_manifest(path):
+    # Last record per source wins; a partially written final line (killed
+    # run) is ignored.
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record["source"]] = record
+    return records
+
+
+def is_complete(record, path):
+    return (record is not None and record["status"] == "done"
+            and record["size"] == fingerprint(path)["size"] and record["mtime"] == fingerprint(path)["mtime"]
+            and os.path.exists(record["output"]))
+
+
+def output_paths(paths, output_dir):
+    # <stem>.pptx, with a short path hash added when two inputs share a stem.
+    names = {}
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    for path, stem in zip(paths, stems):
+        if stems.count(stem) > 1:
+            stem = f"{stem}-{hashlib.sha1(path.encode()).hexdigest()[:8]}"
+        names[path] = os.path.join(output_dir, f"{stem}.pptx")
+    return names
+
+
+# Stage functions. extract_stage and render_stage run in worker processes,
+# so they stay module-level and return plain data; generate_stage and
+# images_stage run on the I/O threads.
+def extract_stage(path):
+    from utils.extract import read_upload
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        data = f.read()
+    # Parallelism comes from the batch pool, not from splitting one PDF.
+    text = read_upload(data, os.path.basename(path), workers=1)
+    return text, time.perf_counter() - start
+
+
+def generate_stage(path, text, slide_count, include_visuals):
+    from utils.deck import new_deck, save_deck
+    from utils.metrics import trace
+    from utils.prompt import get_presentation, is_error_response, slide_repairer
+    from utils.ratelimit import BATCH, priority
+    from utils.slide import parse_gpt_response
+
+    start = time.perf_counter()
+    # Batch calls queue behind interactive decks for the shared quotas.
+    with trace(), priority(BATCH):
+        response_text = get_presentation(text, slide_count, include_visuals=include_visuals)
+        if is_error_response(response_text):
+            raise RuntimeError(response_text)
+        slides = parse_gpt_response(response_text, repair=slide_repairer())
+        deck_id = save_deck(new_deck(slides, text, slide_count, include_visuals))
+    return (slides, deck_id), time.perf_counter() - start
+
+
+def images_stage(slides):
+    # Generates the deck's pictures into the shared image cache, one at a
+    # time per I/O worker. Returns how many failed.
+    from utils.image import ImagePipeline, image_job_for
+    from utils.ratelimit import BATCH, priority
+
+    start = time.perf_counter()
+    failed = 0
+    with priority(BATCH), tempfile.TemporaryDirectory(prefix="batch-images-") as image_dir, \
+            ImagePipeline(max_workers=1) as images:
+        jobs = [job for job in (image_job_for(i, slide, image_dir) for i, slide in enumerate(slides)) if job]
+        images.prefetch_translations(jobs)
+        for job in jobs:
+            if images.result(images.submit(job)) is None:
+                failed += 1
+    return failed, time.perf_counter() - start
+
+
+def cached_images_only(prompt, output_path):
+    # Image backend for the render workers: pictures come from the cache the
+    # images stage filled, and one that failed there gets the text note
+    # instead of a second API call from the process pool.
+    raise RuntimeError("picture was not generated in the images stage")
+
+
+def cached_translation_only(text):
+    # Translator for the render workers, for the same reason: the images
+    # stage stored every description's translation, so a miss means that
+    # picture failed and must not cost a translator call here.
+    from utils.translate import get_translation_service
+
+    translated = get_translation_service().lookup(text)
+    if translated is None:
+        raise RuntimeError("description was not translated in the images stage")
+    return translated
+
+
+def render_stage(slides, output):
+    from utils.slide import generate_pptx
+
+    start = time.perf_counter()
+    partial = output + ".part"
+    generate_pptx(slides, output=partial, image_backend=cached_images_only, translate=cached_translation_only)
+    os.replace(partial, output)
+    return output, time.perf_counter() - start
+
+
+class BatchRun:
+
+    def __init__(self, paths, output_dir, slide_count, include_visuals, cpu_workers, io_workers):
+        self.paths = paths
+        self.output_dir = output_dir
+        self.outputs = output_paths(paths, output_dir)
+        self.slide_count = slide_count
+        self.include_visuals = include_visuals
+        self.cpu_workers = cpu_workers
+        self.io_workers = io_workers
+        self.manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        self.stage_seconds = {"extract": 0.0, "generate": 0.0, "images": 0.0, "render": 0.0}
+        self.counts = {"done": 0, "failed": 0, "skipped": 0}
+        self.chars = 0
+        self.slides = 0
+        self.failed_images = 0
+        self.decks = {}
+
+    def record(self, path, status, started, **fields):
+        record = {"source": path, "status": status, **fingerprint(path), "output": self.outputs[path],
+                  "seconds": round(time.perf_counter() - started, 3), **fields}
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.counts[status] += 1
+
+    def run(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = load_manifest(self.manifest_path)
+        queue = deque()
+        for path in self.paths:
+            if is_complete(manifest.get(path), path):
+                self.counts["skipped"] += 1
+            else:
+                queue.append(path)
+        logger.info("%d documents, %d already done, %d to convert.",
+                    len(self.paths), self.counts["skipped"], len(queue))
+
+        # Enough items in flight to keep both pools busy without holding
+        # every extracted document in memory at once.
+        max_in_flight = 2 * (self.cpu_workers + self.io_workers)
+        started_at = {}
+        in_flight = {}
+        wall_start = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=self.cpu_workers) as cpu, \
+                ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="llm") as io_pool:
+            while queue or in_flight:
+                while queue and len(in_flight) < max_in_flight:
+                    path = queue.popleft()
+                    started_at[path] = time.perf_counter()
+                    in_flight[cpu.submit(extract_stage, path)] = (path, "extract")
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, stage = in_flight.pop(future)
+                    try:
+                        result, seconds = future.result()
+                    except Exception as e:
+                        logger.error("%s failed during %s: %s", path, stage, e)
+                        self.decks.pop(path, None)
+                        self.record(path, "failed", started_at.pop(path), stage=stage, error=str(e))
+                        continue
+                    self.stage_seconds[stage] += seconds
+
+                    if stage == "extract":
+                        self.chars += len(result)
+                        in_flight[io_pool.submit(generate_stage, path, result, self.slide_count,
+                                                 self.include_visuals)] = (path, "generate")
+                    elif stage == "generate":
+                        slides, deck_id = result
+                        self.slides += len(slides)
+                        self.decks[path] = (deck_id, slides)
+                        in_flight[io_pool.submit(images_stage, slides)] = (path, "images")
+                    elif stage == "images":
+                        if result:
+                            logger.warning("%s: %d pictures failed; their slides get a text note.", path, result)
+                            self.failed_images += result
+                        slides = self.decks[path][1]
+                        in_flight[cpu.submit(render_stage, slides, self.outputs[path])] = (path, "render")
+                    else:
+                        deck_id, slides = self.decks.pop(path)
+                        self.record(path, "done", started_at.pop(path), deck_id=deck_id, slides=len(slides))
+                        logger.info("%s -> %s", path, result)
+
+        self.wall_seconds = time.perf_counter() - wall_start
+        return self.summary()
+
+    def summary(self):
+        converted = self.counts["done"]
+        return {
+            **self.counts,
+            "wall_seconds": round(self.wall_seconds, 2),
+            "docs_per_hour": round(converted / self.wall_seconds * 3600, 1) if self.wall_seconds else 0.0,
+            "slides": self.slides,
+            "failed_images": self.failed_images,
+            "extracted_chars": self.chars,
+            "stage_seconds": {stage: round(seconds, 2) for stage, seconds in self.stage_seconds.items()},
+            "cpu_workers": self.cpu_workers,
+            "io_workers": self.io_workers,
+        }
+
+
+def print_summary(summary):
+    print(f"\nConverted {summary['done']} documents "
+          f"({summary['failed']} failed, {summary['skipped']} already done) "
+          f"in {summary['wall_seconds']:.1f}s — {summary['docs_per_hour']:.1f} docs/hour, "
+          f"{summary['slides']} slides.")
+    busy = sum(summary["stage_seconds"].values())
+    for stage, seconds in summary["stage_seconds"].items():
+        share = seconds / busy if busy else 0.0
+        print(f"  {stage:<10} {seconds:9.2f}s worker time  ({share:.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a directory of .pdf/.docx reports into decks.")
+    parser.add_argument("inputs", nargs="+", help="directories or glob patterns")
+    parser.add_argument("--output", default="decks", help="output directory (holds the manifest too)")
+    parser.add_argument("--slides", type=int, default=6)
+    parser.add_argument("--visuals", action="store_true", help="count visual slides in --slides")
+    parser.add_argument("--cpu-workers", type=int, default=os.cpu_count() or 1,
+                        help="processes for extraction and PPTX rendering")
+    parser.add_argument("--io-workers", type=int, default=LLM_CONCURRENCY,
+                        help="threads for model and image API calls")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.environ.get("PPTX_LOG_LEVEL", "INFO"),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    paths = find_documents(args.inputs)
+    run = BatchRun(paths, args.output, args.slides, args.visuals, args.cpu_workers, args.io_workers)
+    summary = run.run()
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,96 @@
+# Cold-start import cost, measured with `python -X importtime` in a fresh
+# interpreter per run. Also checks that the heavy backends stay out of the
+# app's startup path; they are meant to load on first use.
+#
+# Usage: python -m benchmarks.bench_import [--modules main,utils.pipeline]
+#            [--runs 5] [--top 15] [--budget-ms 1500]
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must not be imported just by loading the Streamlit app.
+DEFERRED = ("pdfplumber", "docx", "pptx", "huggingface_hub", "google.generativeai", "googletrans", "requests")
+
+LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+def import_times(module):
+    # Returns {module: (self_us, cumulative_us)} for one cold import.
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            times[name] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def measure(module, runs):
+    totals = []
+    last = {}
+    for _ in range(runs):
+        last = import_times(module)
+        totals.append(last[module][1] / 1000 if module in last else 0.0)
+    heavy = sorted(last.items(), key=lambda item: item[1][1], reverse=True)
+    return {
+        "median_ms": statistics.median(totals),
+        "min_ms": min(totals),
+        "modules": len(last),
+        "deferred_loaded": [name for name in DEFERRED if name in last],
+        "heaviest": [(name, cumulative / 1000) for name, (_, cumulative) in heavy],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", default="main,utils.pipeline,batch")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="fail if importing main takes longer than this (median)")
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules.split(","):
+        result = measure(module, args.runs)
+        results[module] = result
+        print(f"\n{module}: median {result['median_ms']:.0f} ms, min {result['min_ms']:.0f} ms, "
+              f"{result['modules']} modules")
+        if result["deferred_loaded"]:
+            print(f"  loads deferred backends: {', '.join(result['deferred_loaded'])}")
+        for name, ms in result["heaviest"][:args.top]:
+            print(f"  {ms:9.1f} ms  {name}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"import-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({name: {**result, "heaviest": result["heaviest"][:args.top]} for name, result in results.items()},
+                  f, indent=2)
+    print(f"\nResults written to {path}")
+
+    app = results.get("main")
+    if app is not None:
+        if app["deferred_loaded"]:
+            print(f"FAIL: importing main loads {', '.join(app['deferred_loaded'])}")
+            return 1
+        if args.budget_ms and app["median_ms"] > args.budget_ms:
+            print(f"FAIL: importing main took {app['median_ms']:.0f} ms (budget {args.budget_ms:.0f} ms)")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,183 @@
+# Offline end-to-end benchmark: real extraction, parsing and PPTX building
+# with local fakes for the LLM, translator and image backend.
+#
+# Usage: python -m benchmarks.bench_pipeline [--sizes 5,20,50,200] [--runs 3]
+#            [--llm-latency 0.5] [--image-latency 0.2] [--failure-rate 0.05]
+#            [--parser stream|full|both]
+#
+# --parser full buffers the whole model response and parses it with
+# parse_gpt_response (the non-streaming path); stream feeds the chunks to
+# iter_slides as the app does.
+import argparse
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+
+from docx import Document
+from PIL import Image
+
+from benchmarks.synthetic import make_deck, make_pages, write_pdf
+from utils.extract import read_upload
+from utils.metrics import registry, span, trace
+from utils.prompt import stream_presentation
+from utils.slide import generate_pptx, iter_slides, parse_gpt_response
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+class FakeFailure(RuntimeError):
+    pass
+
+
+class Fakes:
+
+    def __init__(self, llm_latency, translate_latency, image_latency, failure_rate, seed=0):
+        self.llm_latency = llm_latency
+        self.translate_latency = translate_latency
+        self.image_latency = image_latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.deck = None
+
+    def maybe_fail(self, what):
+        if self.rng.random() < self.failure_rate:
+            raise FakeFailure(f"fake {what} failure")
+
+    def stream(self, prompt, model_name):
+        # Emits the prepared deck as JSON in small chunks, spreading the
+        # configured latency across the stream like a real model would.
+        with span("llm_stream", model=model_name) as record:
+            self.maybe_fail("llm")
+            text = json.dumps(self.deck, ensure_ascii=False, indent=2)
+            chunks = [text[i:i + 256] for i in range(0, len(text), 256)]
+            for chunk in chunks:
+                time.sleep(self.llm_latency / len(chunks))
+                yield chunk
+            record["counters"]["response_chars"] = len(text)
+
+    def summarize(self, prompt):
+        time.sleep(self.llm_latency)
+        return prompt[:2000]
+
+    def translate(self, description):
+        time.sleep(self.translate_latency)
+        self.maybe_fail("translation")
+        return description
+
+    def image(self, prompt, output_path):
+        time.sleep(self.image_latency)
+        self.maybe_fail("image")
+        Image.new("RGB", (512, 512), (self.rng.randrange(256), 80, 160)).save(output_path)
+        return output_path
+
+
+def write_document(directory, kind, pages):
+    if kind == "pdf":
+        path = write_pdf(os.path.join(directory, "doc.pdf"), make_pages(pages))
+    else:
+        path = os.path.join(directory, "doc.docx")
+        doc = Document()
+        for lines in make_pages(pages):
+            for line in lines:
+                doc.add_paragraph(line)
+        doc.save(path)
+    with open(path, "rb") as f:
+        return f.read(), os.path.basename(path)
+
+
+def run_once(fakes, data, filename, slide_count, parser="stream"):
+    with trace():
+        doc_text = read_upload(data, filename, use_cache=False)
+        chunks = stream_presentation(doc_text, slide_count, use_cache=False, stream=fakes.stream,
+                                     summarize=fakes.summarize)
+        if parser == "full":
+            with span("parse_gpt_response"):
+                slides = parse_gpt_response("".join(chunks))
+        else:
+            slides = iter_slides(chunks)
+        return generate_pptx(slides, output=None, image_backend=fakes.image,
+                             translate=fakes.translate, image_cache=False)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark.")
+    parser.add_argument("--sizes", default="5,20,50,200", help="slide counts per deck")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--document", choices=("pdf", "docx"), default="docx")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--translate-latency", type=float, default=0.05)
+    parser.add_argument("--image-latency", type=float, default=0.2)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--parser", choices=("stream", "full", "both"), default="both",
+                        help="slide parsing path: iter_slides, parse_gpt_response or both")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    fakes = Fakes(args.llm_latency, args.translate_latency, args.image_latency, args.failure_rate)
+    results = {"config": vars(args), "runs": []}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data, filename = write_document(tmp, args.document, args.pages)
+
+        sizes = [int(s) for s in args.sizes.split(",")]
+        modes = ("stream", "full") if args.parser == "both" else (args.parser,)
+        for size, mode in [(size, mode) for size in sizes for mode in modes]:
+            fakes.deck = make_deck(max(size - 3, 1))
+            registry.reset()
+            latencies, errors, deck_bytes = [], 0, 0
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                run_start = time.perf_counter()
+                try:
+                    deck_bytes = len(run_once(fakes, data, filename, size, mode))
+                except FakeFailure:
+                    errors += 1
+                latencies.append(time.perf_counter() - run_start)
+            elapsed = time.perf_counter() - start
+
+            row = {
+                "slides": size,
+                "parser": mode,
+                "runs": args.runs,
+                "errors": errors,
+                "decks_per_second": args.runs / elapsed,
+                "p50_seconds": percentile(latencies, 50),
+                "p95_seconds": percentile(latencies, 95),
+                "peak_rss_mb": peak_rss_mb(),
+                "deck_bytes": deck_bytes,
+                "stages": registry.summary(),
+            }
+            results["runs"].append(row)
+            print(f"{size:>4} slides  {mode:<6}  p50 {row['p50_seconds']:6.2f}s  p95 {row['p95_seconds']:6.2f}s  "
+                  f"{row['decks_per_second']:6.2f} decks/s  rss {row['peak_rss_mb']:7.1f} MB  errors {errors}")
+            for stage, stats in row["stages"].items():
+                print(f"        {stage:<28} n={stats['count']:<5} total {stats['total']:7.3f}s")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, time.strftime("pipeline-%Y%m%d-%H%M%S.json"))
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Streaming DOCX extraction against the original python-docx path: time,
+# peak memory (each reader runs in its own process) and whether tables
+# are covered.
+#
+# Usage: python -m benchmarks.bench_read_docx [--paragraphs 20000,200000]
+#            [--table-rows 150000]
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+from benchmarks.synthetic import make_blocks, write_docx
+
+
+def read_docx_python_docx(path):
+    # The original implementation, kept here as the baseline: paragraphs
+    # only, from a fully built document tree.
+    from docx import Document
+
+    doc = Document(path)
+    return '\n'.join([para.text for para in doc.paragraphs if para.text.strip()])
+
+
+def read_docx_streaming(path):
+    from utils.extract import read_docx
+
+    return read_docx(path)
+
+
+def consume_docx_blocks(path):
+    # Walks the generator without keeping the text, to show the parser's
+    # own memory use apart from the size of the extracted string.
+    from utils.extract import iter_docx_blocks
+
+    chars = rows = 0
+    for block in iter_docx_blocks(path):
+        chars += len(block) + 1
+        rows += " | " in block
+    return chars, rows
+
+
+def text_stats(text):
+    return len(text), sum(" | " in line for line in text.split("\n"))
+
+
+READERS = {
+    "python-docx (original)": read_docx_python_docx,
+    "iterparse (streaming)": read_docx_streaming,
+    "iterparse (generator)": consume_docx_blocks,
+}
+
+
+def measure(reader, path):
+    # Runs in a child process so ru_maxrss is this reader's peak alone.
+    start = time.perf_counter()
+    result = READERS[reader](path)
+    elapsed = time.perf_counter() - start
+    chars, table_rows = text_stats(result) if isinstance(result, str) else result
+    print(json.dumps({
+        "seconds": elapsed,
+        "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "chars": chars,
+        "table_rows": table_rows,
+    }))
+
+
+def run_reader(reader, path):
+    result = subprocess.run([sys.executable, "-m", "benchmarks.bench_read_docx", "--measure", reader, path],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paragraphs", default="20000,200000")
+    parser.add_argument("--table-rows", type=int, default=150000,
+                        help="rows of the single-table document (0 skips it)")
+    parser.add_argument("--measure", nargs=2, metavar=("READER", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    # Mostly-paragraph documents, plus one that is a single huge table:
+    # its rows must be released as they are read, not at </w:tbl>.
+    cases = [(f"{count} paragraphs", f"synthetic-{count}.docx", make_blocks(count))
+             for count in [int(n) for n in args.paragraphs.split(",")]]
+    if args.table_rows:
+        cases.append((f"one {args.table_rows}-row table", "synthetic-table.docx",
+                      make_blocks(1, table_every=1, rows=args.table_rows)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, name, blocks in cases:
+            path = write_docx(os.path.join(tmp, name), blocks)
+            with zipfile.ZipFile(path) as archive:
+                xml_mb = archive.getinfo("word/document.xml").file_size / 1e6
+            print(f"\n{label}: {os.path.getsize(path) / 1e6:.1f} MB docx, {xml_mb:.0f} MB document.xml")
+            for reader in READERS:
+                result = run_reader(reader, path)
+                print(f"  {reader:<24} {result['seconds']:8.2f}s  peak {result['peak_mb']:7.0f} MB  "
+                      f"{result['chars']:>11,} chars  {result['table_rows']:>7,} table rows")
+
+
+if __name__ == "__main__":
+    main()
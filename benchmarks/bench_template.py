@@ -0,0 +1,64 @@
+# Usage: python -m benchmarks.bench_template [decks] [main_slides]
+import os
+import sys
+import tempfile
+import time
+
+from pptx import Presentation
+
+from benchmarks.synthetic import make_deck
+from utils.slide import generate_pptx
+from utils.template import EXAMPLE_SLIDES, TEMPLATE_PATH, Template
+
+
+# Baseline: what generate_pptx used to do per request — parse the template
+# from disk and unlink the example slides (their parts stay in the file).
+class ReparseTemplate(Template):
+
+    def clone(self):
+        prs = Presentation(self.path)
+        for slide_index in sorted(EXAMPLE_SLIDES, reverse=True):
+            slide_id = prs.slides._sldIdLst[slide_index]
+            prs.slides._sldIdLst.remove(slide_id)
+        return prs
+
+
+def run(label, template, decks, slides):
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "deck.pptx")
+        start = time.perf_counter()
+        for _ in range(decks):
+            generate_pptx(slides, output, image_cache=False, template=template)
+        elapsed = (time.perf_counter() - start) / decks
+        size = os.path.getsize(output)
+    print(f"{label:<12} {elapsed * 1000:8.1f} ms/deck  {size / 1024:8.0f} KB")
+    return elapsed
+
+
+def time_clone(label, template, decks):
+    start = time.perf_counter()
+    for _ in range(decks):
+        template.clone()
+    elapsed = (time.perf_counter() - start) / decks
+    print(f"{label:<12} {elapsed * 1000:8.1f} ms/template")
+
+
+def main():
+    decks = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    main_slides = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    # Text-only decks so the numbers reflect template handling, not charts.
+    slides = make_deck(main_slides, visuals=("none",))
+
+    start = time.perf_counter()
+    template = Template(TEMPLATE_PATH)
+    print(f"template load (once) {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    time_clone("reparse", ReparseTemplate(TEMPLATE_PATH), decks)
+    time_clone("clone", template, decks)
+    before = run("reparse", ReparseTemplate(TEMPLATE_PATH), decks, slides)
+    after = run("clone", template, decks, slides)
+    print(f"speedup      {before / after:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
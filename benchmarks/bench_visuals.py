@@ -0,0 +1,82 @@
+# Stock picture index: build time, load (mmap) time, lookup latency and how
+# many image slides it resolves at a given threshold, on a synthetic
+# captioned library.
+#
+# Usage: python -m benchmarks.bench_visuals [--pictures 5000] [--queries 500]
+#            [--threshold 0.35]
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from PIL import Image
+
+from benchmarks.synthetic import WORDS
+from utils.visuals import VisualIndex, build_index
+
+
+SUFFIXES = ("", "lar", "ları", "ın", "da", "dan")
+OTHER_WORDS = "dəniz dağ meşə şəhər gecə səhra qar çay körpü bulud ulduz".split()
+
+
+def make_library(directory, count, rng):
+    pixel = Image.new("RGB", (8, 8), (20, 120, 200))
+    captions = []
+    for i in range(count):
+        caption = " ".join(rng.sample(WORDS, 4))
+        pixel.save(os.path.join(directory, f"stock_{i:05d}.png"))
+        with open(os.path.join(directory, f"stock_{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(caption)
+        captions.append(caption)
+    return captions
+
+
+def paraphrase(caption, rng):
+    # Same subject, different inflection and extra words, as a slide
+    # description would phrase it.
+    words = [word + rng.choice(SUFFIXES) for word in caption.split()[:3]]
+    return " ".join(words + rng.sample(OTHER_WORDS, 2))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pictures", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--threshold", type=float, default=0.35)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        library, index_dir = os.path.join(tmp, "library"), os.path.join(tmp, "index")
+        os.makedirs(library)
+        captions = make_library(library, args.pictures, rng)
+
+        start = time.perf_counter()
+        items, terms = build_index(library, index_dir)
+        print(f"build: {items} pictures, {terms} terms in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        index = VisualIndex(index_dir, threshold=args.threshold)
+        print(f"load (mmap): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        related = [paraphrase(rng.choice(captions), rng) for _ in range(args.queries // 2)]
+        unrelated = [" ".join(rng.sample(OTHER_WORDS, 4)) for _ in range(args.queries - len(related))]
+        latencies = []
+        hits = {"related": 0, "unrelated": 0}
+        for kind, queries in (("related", related), ("unrelated", unrelated)):
+            for query in queries:
+                start = time.perf_counter()
+                hits[kind] += index.match(query) is not None
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        latencies.sort()
+        print(f"lookup: p50 {statistics.median(latencies):.2f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f} ms")
+        print(f"threshold {args.threshold}: {hits['related']}/{len(related)} related descriptions resolved, "
+              f"{hits['unrelated']}/{len(unrelated)} unrelated ones wrongly matched")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import random
+
+
+WORDS = (
+    "layihə təqdimat nəticə göstərici inkişaf strategiya hesabat məlumat analiz "
+    "bazar gəlir xərc artım investisiya texnologiya təhsil sənaye region plan"
+).split()
+
+
+def make_paragraph(rng, words=60):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def make_pages(page_count, lines_per_page=40, seed=0):
+    rng = random.Random(seed)
+    return [
+        [f"Səhifə {page + 1}. " + make_paragraph(rng, 10) for _ in range(lines_per_page)]
+        for page in range(page_count)
+    ]
+
+
+def pdf_escape(text):
+    # Core PDF fonts only cover Latin-1, which is fine for benchmark text.
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    # Minimal hand-written PDF (one Helvetica text stream per page), so the
+    # benchmarks need no PDF authoring library.
+    objects = []
+    page_ids = []
+    font_id = 3
+    next_id = 4
+    for lines in pages:
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for line in lines:
+            ops.append(f"({pdf_escape(line[:110])}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        page_id, content_id = next_id, next_id + 1
+        next_id += 2
+        page_ids.append(page_id)
+        objects.append((page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()))
+        objects.append((content_id, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"))
+
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects = [
+        (1, b"<< /Type /Catalog /Pages 2 0 R >>"),
+        (2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()),
+        (font_id, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"),
+    ] + objects
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id, body in objects:
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n" % obj_id + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (next_id)
+    for obj_id in range(1, next_id):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_id, xref)
+
+    with open(path, "wb") as f:
+        f.write(out)
+    return path
+
+
+DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+
+def make_blocks(paragraph_count, table_every=20, rows=8, cols=4, seed=0):
+    # Paragraphs with a numeric table every table_every paragraphs.
+    rng = random.Random(seed)
+    for i in range(paragraph_count):
+        yield make_paragraph(rng, 60)
+        if table_every and i % table_every == table_every - 1:
+            yield [[rng.choice(WORDS)] + [f"{rng.randint(1, 99999):,}" for _ in range(cols - 1)] for _ in range(rows)]
+
+
+def xml_escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def write_docx(path, blocks):
+    # Minimal hand-written .docx; blocks are paragraph strings or tables
+    # (lists of rows). The XML is streamed into the archive, so very large
+    # files can be produced without holding them in memory.
+    import zipfile
+
+    def paragraph(text):
+        return f'<w:p><w:r><w:t xml:space="preserve">{xml_escape(text)}</w:t></w:r></w:p>'
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", DOCX_CONTENT_TYPES)
+        archive.writestr("_rels/.rels", DOCX_RELS)
+        with archive.open("word/document.xml", "w", force_zip64=True) as xml:
+            xml.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                      b'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                      b'<w:body>')
+            for block in blocks:
+                if isinstance(block, str):
+                    xml.write(paragraph(block).encode("utf-8"))
+                else:
+                    xml.write(b"<w:tbl>")
+                    for row in block:
+                        cells = "".join(f"<w:tc>{paragraph(cell)}</w:tc>" for cell in row)
+                        xml.write(f"<w:tr>{cells}</w:tr>".encode("utf-8"))
+                    xml.write(b"</w:tbl>")
+            xml.write(b"</w:body></w:document>")
+    return path
+
+
+def make_visual(kind, index, rng):
+    visual = {
+        "type": kind, "title": f"Vizual {index}", "description": "", "xlabel": "", "ylabel": "",
+        "x": [], "y": [], "labels": [], "sizes": [],
+    }
+    if kind in ("bar", "line"):
+        visual.update(xlabel="İl", ylabel="Dəyər", x=[str(2015 + i) for i in range(6)],
+                      y=[str(rng.randint(10, 500)) for _ in range(6)])
+    elif kind == "pie":
+        visual.update(labels=[rng.choice(WORDS) for _ in range(4)], sizes=["40%", "30%", "20%", "10%"])
+    elif kind == "image":
+        visual["description"] = make_paragraph(rng, 12)
+    return visual
+
+
+def make_deck(main_slides, visuals=("image", "bar", "pie", "line", "none"), seed=0):
+    rng = random.Random(seed)
+    slides = [
+        {"type": "title", "title": "Sintetik təqdimat"},
+        {"type": "intro", "aim": make_paragraph(rng, 15), "summary": make_paragraph(rng, 40)},
+    ]
+    for index in range(main_slides):
+        slide = {"type": "main", "title": f"Mövzu {index + 1}",
+                 "visual": make_visual(visuals[index % len(visuals)], index, rng)}
+        for point in range(1, 5):
+            slide[f"point{point}"] = make_paragraph(rng, 12)
+        slides.append(slide)
+    slides.append({"type": "recommendation",
+                   **{f"recommendation{i}": make_paragraph(rng, 10) for i in range(1, 6)}})
+    return slides
@@ -0,0 +1,25 @@
+# Builds the stock picture index used before diffusion for image slides
+# (utils.visuals). The library is a directory of .png/.jpg files, each
+# optionally captioned by a .txt file with the same name; otherwise the file
+# name is the caption. Rebuild whenever the library changes.
+#
+# Usage: python build_visual_index.py path/to/library [--out visual_index]
+import argparse
+import time
+
+from utils.visuals import VISUAL_INDEX_DIR, build_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the stock picture index for image slides.")
+    parser.add_argument("library", help="directory of captioned .png/.jpg pictures")
+    parser.add_argument("--out", default=VISUAL_INDEX_DIR, help="index directory (PPTX_VISUAL_INDEX)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    items, terms = build_index(args.library, args.out)
+    print(f"Indexed {items} pictures ({terms} terms) into {args.out} in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,78 @@
 
-import streamlit as st
-import tempfile
-from docx import Document
-import pdfplumber
+import json
+import logging
 import os
-from utils.slide  import parse_gpt_response
-from utils.slide import generate_pptx
-from utils.prompt import get_presentation
-
-def read_pdf(file_path):
-
-    text = ''
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + '\n'
-    return text.strip()
-
-def read_file(file_path):
-    ext = os.path.splitext(file_path)[1].lower()
-
-    if ext == '.docx':
-        doc = Document(file_path)
-        return '\n'.join([para.text for para in doc.paragraphs if para.text.strip()])
-
-    elif ext == '.pdf':
-        return read_pdf(file_path)
-    else:
-        raise ValueError("Unsupported file format: Only .docx and .pdf are supported.")
-
+import time
 
+import streamlit as st
+from utils import jobs
+from utils.artifacts import get_artifact, has_artifact
+
+
+STAGE_LABELS = {
+    "queued": "Növbədə gözləyir...",
+    "running": "Başlanır...",
+    "read": "Fayl oxunur...",
+    "generate": "Təqdimat hazırlanır...",
+    "render": "Təqdimat yığılır...",
+    "done": "Tamamlandı",
+}
+
+
+# Cached as a Streamlit resource so the worker pool (and the jobs it holds)
+# survives module reloads. The deck-building modules (pptx, pdfplumber,
+# model clients) are imported only when a job is actually submitted, which
+# keeps the app's cold start to Streamlit itself.
+@st.cache_resource(show_spinner=False)
+def get_job_manager():
+    return jobs.get_job_manager()
+
+
+def read_artifact(artifact_id):
+    # Deferred download callback. An artifact that expired after the page
+    # was drawn fails the download (Streamlit shows an error) rather than
+    # serving an empty .pptx.
+    data = get_artifact(artifact_id)
+    if data is None:
+        raise FileNotFoundError(f"Artifact {artifact_id} has expired.")
+    return data
+
+
+def slide_editor(deck_id):
+    # Reworks one slide of the last deck; only that slide goes back to the
+    # model and the rest of the deck is reassembled from saved pieces.
+    from utils.deck import load_deck
+    from utils.pipeline import update_slide
+
+    try:
+        deck = load_deck(deck_id)
+    except KeyError:
+        return
+
+    with st.expander("Slaydı dəyiş"):
+        slides = deck["slides"]
+        index = st.selectbox(
+            "Slayd", range(len(slides)),
+            format_func=lambda i: f"{i + 1}. {slides[i].get('title') or slides[i].get('type')}"
+        )
+        instruction = st.text_input("Nəyi dəyişmək istəyirsiniz?", key=f"slide_instruction_{index}")
+        edited = st.text_area("Slaydın JSON-u", json.dumps(slides[index], ensure_ascii=False, indent=2),
+                              height=300, key=f"slide_json_{deck_id}_{index}")
+
+        regenerate_col, save_col = st.columns(2)
+        if regenerate_col.button("Slaydı yenidən yarat"):
+            st.session_state.job_id = get_job_manager().submit(
+                update_slide, deck_id, index, instruction=instruction or None
+            )
+            st.rerun()
+        if save_col.button("Dəyişiklikləri saxla"):
+            try:
+                slide = json.loads(edited)
+            except json.JSONDecodeError as e:
+                st.error(f"Error: {e}")
+                return
+            st.session_state.job_id = get_job_manager().submit(update_slide, deck_id, index, slide=slide)
+            st.rerun()
 
 
 def streamlit():
@@ -53,44 +95,65 @@ def streamlit():
     else:
         generate_btn = False
 
-    if "pptx_bytes" not in st.session_state:
-        st.session_state.pptx_bytes = None
+    # The session only holds ids; the deck itself stays in the artifact store.
+    if "artifact_id" not in st.session_state:
+        st.session_state.artifact_id = None
     if "generation_done" not in st.session_state:
         st.session_state.generation_done = False
+    if "job_id" not in st.session_state:
+        st.session_state.job_id = None
+    if "deck_id" not in st.session_state:
+        st.session_state.deck_id = None
 
     if uploaded_file and generate_btn:
-        try:
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[-1]) as tmp:
-                tmp.write(uploaded_file.read())
-                tmp_path = tmp.name
-
-            # Step 1: Extract text
-            with st.spinner("Fayl oxunur və təqdimat hazırlanır..."):
-                doc_text = read_file(tmp_path)
-                gpt_response = get_presentation(doc_text, slide_count, include_visuals=(include_visuals == "Bəli"))
-                slides = parse_gpt_response(gpt_response)
-
-                output_filename = "generated_presentation.pptx"
-                generate_pptx(slides, output_filename)
-
-                with open(output_filename, "rb") as f:
-                    st.session_state.pptx_bytes = f.read()
+        from utils.pipeline import build_presentation
+
+        # Generation runs in the background job pool; the session only keeps
+        # the job id, so reruns of this script don't restart the work.
+        st.session_state.job_id = get_job_manager().submit(
+            build_presentation,
+            uploaded_file.getvalue(),
+            uploaded_file.name,
+            slide_count,
+            include_visuals=(include_visuals == "Bəli"),
+        )
+        st.session_state.generation_done = False
+        st.session_state.artifact_id = None
+        st.session_state.deck_id = None
 
+    job = get_job_manager().get(st.session_state.job_id) if st.session_state.job_id else None
+    if job is not None:
+        if job.status == "done":
+            st.session_state.deck_id, st.session_state.artifact_id = job.result
             st.session_state.generation_done = True
+            st.session_state.job_id = None
             st.success("Təqdimat uğurla yaradıldı!")
-
-        except Exception as e:
-            st.error(f"Error: {e}")
-
-    if st.session_state.generation_done and st.session_state.pptx_bytes:
+        elif job.status == "failed":
+            st.session_state.job_id = None
+            st.error(f"Error: {job.error}")
+        else:
+            st.progress(job.progress, text=STAGE_LABELS.get(job.stage, job.stage))
+            time.sleep(1)
+            st.rerun()
+
+    artifact_id = st.session_state.artifact_id
+    if st.session_state.generation_done and artifact_id and not has_artifact(artifact_id):
+        st.warning("Təqdimatın saxlanma müddəti bitib. Zəhmət olmasa, yenidən yaradın.")
+        st.session_state.generation_done = False
+        st.session_state.artifact_id = None
+    elif st.session_state.generation_done and artifact_id:
+        # Deferred download: the file is read from disk only when clicked.
         st.download_button(
             label="PPTX Faylını Yüklə",
-            data=st.session_state.pptx_bytes,
+            data=lambda: read_artifact(artifact_id),
             file_name="generated_presentation.pptx",
             mime="application/vnd.openxmlformats-officedocument.presentationml.presentation"
         )
+        if st.session_state.deck_id:
+            slide_editor(st.session_state.deck_id)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("PPTX_LOG_LEVEL", "INFO"),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     streamlit()
\ No newline at end of file
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from utils.chart_data import parse_numbers
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("12,5", 12.5),
+    ("1,234", 1234.0),
+    ("1.234,5", 1234.5),
+    ("1 234 ₼", 1234.0),
+    ("45 %", 45.0),
+    ("+5", 5.0),
+    ("−5", -5.0),
+    ("(12)", -12.0),
+    ("(1 234,5)", -1234.5),
+    ("1.5e3", 1500.0),
+    ("2E-2", 0.02),
+    ("12 mln", 12.0),
+    ("12 mln AZN", 12.0),
+    ("3,4 mlrd manat", 3.4),
+    ("$1.5e3 USD", 1500.0),
+])
+def test_parses_decorated_numbers(value, expected):
+    # Each value is parsed next to one with words, so the per-item fallback
+    # path is exercised as well as the vectorized one.
+    assert parse_numbers([value])[0] == pytest.approx(expected)
+    assert parse_numbers([value, "n/a"])[0] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("value", ["n/a", "2020-2021", "3 of 4", "təxminən 12", "12 nəfər", "Q4"])
+def test_entries_that_are_not_a_single_figure_are_nan(value):
+    assert np.isnan(parse_numbers([value, "1"])[0])
+
+
+def test_plain_numbers_pass_through():
+    assert parse_numbers([1, 2.5, "3"]).tolist() == [1.0, 2.5, 3.0]
@@ -0,0 +1,45 @@
+from utils.compact import compact_text
+
+
+def report(pages):
+    # Form-feed separated pages with a running header and a page-number footer.
+    return "\f".join(
+        "\n".join(["Azərenerji — İllik hesabat 2023", *body, f"Səhifə {number} / {len(pages)}"])
+        for number, body in enumerate(pages, 1)
+    )
+
+
+def test_headers_footers_and_page_numbers_are_removed():
+    text = report([[f"Bölmə {n} üzrə nəticələr və təhlil.", "Əsas göstəricilər aşağıdadır."] for n in range(1, 5)])
+    compacted, stats = compact_text(text)
+    assert "İllik hesabat" not in compacted
+    assert "Səhifə" not in compacted
+    assert stats["boilerplate_lines"] == 8
+    assert compacted.count("Əsas göstəricilər") == 4
+
+
+def test_data_lines_repeated_across_pages_survive():
+    pages = [
+        ["Giriş mətni bu səhifədə.", f"Bölmə {n} başlıq", f"Gəlir: {n * 12} mln AZN", f"Xərc: {n * 7} mln AZN",
+         "Qeyd: rəqəmlər auditdən keçib.", "Növbəti bölməyə keçid."]
+        for n in range(1, 5)
+    ]
+    compacted, stats = compact_text(report(pages))
+    for n in range(1, 5):
+        assert f"Bölmə {n} başlıq" in compacted
+        assert f"Gəlir: {n * 12} mln AZN" in compacted
+        assert f"Xərc: {n * 7} mln AZN" in compacted
+    assert stats["tokens_after"] > 0
+
+
+def test_short_repetitive_pages_fall_back_to_uncompacted_text():
+    text = "\f".join(f"Bölmə {n} başlıq\nGəlir: {n} mln AZN" for n in range(1, 5))
+    compacted, stats = compact_text(text)
+    assert compacted.split("\n") == [line for page in text.split("\f") for line in page.split("\n")]
+    assert stats["boilerplate_lines"] == 0
+
+
+def test_numbers_inside_docx_text_are_kept():
+    text = "Satış həcmi\n2021\n120\n2022\n135"
+    compacted, _ = compact_text(text)
+    assert compacted == text
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from utils import llm
+from utils.deck import regenerate_slide
+from utils.llm import FakeBackend, set_backend
+
+
+DECK = {
+    "document": "Gəlir 2023-cü ildə artıb.",
+    "slides": [
+        {"type": "title", "title": "Hesabat"},
+        {"type": "intro", "aim": "Məqsəd", "summary": "Xülasə"},
+    ],
+}
+INTRO = {"type": "intro", "aim": "Yeni məqsəd", "summary": "Yeni xülasə"}
+TITLE = {"type": "title", "title": "Başqa slayd"}
+
+
+@pytest.fixture
+def backend():
+    previous = llm._backend
+    replies = {}
+    fake = FakeBackend(lambda prompt: json.dumps(replies["repair" if "Xətalar:" in prompt else "slide"]))
+    fake.replies = replies
+    set_backend(fake)
+    yield fake
+    set_backend(previous)
+
+
+def test_reply_of_another_type_is_repaired(backend):
+    backend.replies.update(slide=TITLE, repair=INTRO)
+    deck = json.loads(json.dumps(DECK))
+    assert regenerate_slide(deck, 1, use_cache=False) == INTRO
+    assert deck["slides"][1] == INTRO
+    assert backend.calls == 2
+
+
+def test_reply_of_another_type_is_refused(backend):
+    backend.replies.update(slide=TITLE, repair=TITLE)
+    deck = json.loads(json.dumps(DECK))
+    with pytest.raises(ValueError, match="must keep type 'intro'"):
+        regenerate_slide(deck, 1, use_cache=False)
+    assert deck["slides"][1] == DECK["slides"][1]
@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+
+import pytest
+
+from utils import llm, ratelimit
+from utils.llm import FakeBackend
+from utils.ratelimit import RateLimiter, set_rate_limiter
+from utils.summarize import estimate_tokens
+
+
+TPM = 6000  # refills 100 tokens a second, so a test run barely moves the bucket
+CONFIG = {"max_output_tokens": 1000}
+
+
+class RateLimitedOnce(Exception):
+    code = 429
+
+
+class FlakyBackend(FakeBackend):
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = 1
+
+    def _generate(self, prompt, model_name, system, config):
+        if self.failures:
+            self.failures -= 1
+            raise RateLimitedOnce("429 Too Many Requests")
+        return super()._generate(prompt, model_name, system, config)
+
+
+@pytest.fixture
+def limiter(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm, "backoff_delay", lambda attempt: 0)
+    previous = ratelimit._limiter
+    limiter = RateLimiter(str(tmp_path / "ratelimit.sqlite3"), limits={"fake": {"tpm": TPM}})
+    set_rate_limiter(limiter)
+    yield limiter
+    set_rate_limiter(previous)
+
+
+def tokens_left(limiter):
+    with sqlite3.connect(limiter.path) as conn:
+        return conn.execute("SELECT level FROM buckets WHERE name = 'fake:model:tpm'").fetchone()[0]
+
+
+def test_generate_inside_stream_does_not_deadlock():
+    # A slide repair made while the deck stream is still open must not wait
+    # for the slot the stream is holding.
+    backend = FakeBackend(lambda prompt: "abcdef", chunk_size=2, max_concurrency=1)
+    repaired = []
+
+    def consume():
+        for chunk in backend.stream("deck"):
+            repaired.append(backend.generate("repair")[0])
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert repaired == ["abcdef"] * 3
+
+
+def test_rate_limited_retry_is_charged_once(limiter):
+    backend = FlakyBackend(respond=lambda prompt: "cavab " * 40)
+    text, _ = backend.generate("sorğu " * 100, "model", config=CONFIG)
+    assert backend.calls == 1
+    charged = estimate_tokens("sorğu " * 100) + estimate_tokens(text)
+    assert tokens_left(limiter) == pytest.approx(TPM - charged, abs=100)
+
+
+def test_stream_stopped_early_is_charged_for_what_was_read(limiter):
+    backend = FakeBackend(respond=lambda prompt: "x" * 4000, chunk_size=400)
+    chunks = backend.stream("sorğu " * 100, "model", config=CONFIG)
+    next(chunks)
+    chunks.close()
+    charged = estimate_tokens("sorğu " * 100) + 400 // 4
+    assert tokens_left(limiter) == pytest.approx(TPM - charged, abs=100)
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from utils.schema import repair_json
+from utils.slide import SlideStreamParser, iter_slides
+
+
+# A recorded model response: pretty-printed like Gemini's JSON mode, with
+# brackets, braces and escaped quotes inside string values.
+SLIDES = [
+    {"type": "title", "title": "Gəlir {2023} və [plan] \"əsas\" hesabat"},
+    {"type": "intro", "aim": "Məqsəd: {a} } ] [", "summary": "Sitat: \"x\\\"y\" və \\ işarəsi"},
+    {
+        "type": "main", "title": "Göstəricilər", "point1": "1", "point2": "2", "point3": "3", "point4": "4",
+        "visual": {"type": "bar", "title": "", "x": ["2022", "2023"], "y": [12.5, -3], "labels": [], "sizes": []},
+    },
+    {"type": "recommendation", **{f"recommendation{i}": f"Tövsiyə {i} {{}}" for i in range(1, 5)}},
+]
+RESPONSE = "```json\n" + json.dumps(SLIDES, ensure_ascii=False, indent=2) + "\n```"
+
+
+def feed_all(chunks):
+    parser = SlideStreamParser()
+    objects = []
+    for chunk in chunks:
+        objects.extend(parser.feed(chunk))
+    return parser, [json.loads(raw) for raw in objects]
+
+
+@pytest.mark.parametrize("offset", range(len(RESPONSE) + 1))
+def test_parser_split_at_every_offset(offset):
+    parser, slides = feed_all([RESPONSE[:offset], RESPONSE[offset:]])
+    assert slides == SLIDES
+    assert parser.done
+    assert parser.pending() is None
+
+
+def test_parser_one_character_at_a_time():
+    _, slides = feed_all(RESPONSE)
+    assert slides == SLIDES
+
+
+def test_parser_ignores_text_after_the_array():
+    _, slides = feed_all([RESPONSE, '\n[{"type": "title", "title": "extra"}]'])
+    assert slides == SLIDES
+
+
+@pytest.mark.parametrize("offset", range(1, len(RESPONSE)))
+def test_truncated_array_yields_finished_slides(offset):
+    parser, slides = feed_all([RESPONSE[:offset]])
+    assert slides == SLIDES[:len(slides)]
+    pending = parser.pending()
+    if pending is not None:
+        assert pending.startswith("{")
+        assert isinstance(json.loads(repair_json(pending)), dict)
+
+
+def test_iter_slides_repairs_a_cut_off_last_slide():
+    cut = RESPONSE.index("Tövsiyə 4") + len("Tövsiyə")
+    slides = list(iter_slides([RESPONSE[:cut]]))
+    assert slides[:3] == SLIDES[:3]
+    assert slides[3]["recommendation4"] == "Tövsiyə"
+
+
+def test_iter_slides_sends_broken_slides_to_repair():
+    broken = json.dumps([SLIDES[0], {"type": "intro", "aim": "a"}], ensure_ascii=False)
+    calls = []
+
+    def repair(items):
+        calls.append(items)
+        return {i: {"type": "intro", "aim": "a", "summary": "s"} for i, _, _ in items}
+
+    slides = list(iter_slides([broken], repair=repair))
+    assert slides[1]["summary"] == "s"
+    assert [i for i, _, _ in calls[0]] == [1]
+
+
+def test_iter_slides_rejects_prose():
+    with pytest.raises(ValueError):
+        list(iter_slides(["Bağışlayın, bunu edə bilmərəm."]))
+
+
+def test_repair_json_round_trips_valid_json():
+    assert json.loads(repair_json(RESPONSE)) == SLIDES
+
+
+@pytest.mark.parametrize("offset", range(RESPONSE.index("[") + 1, len(RESPONSE)))
+def test_repair_json_closes_every_prefix(offset):
+    repaired = json.loads(repair_json(RESPONSE[:offset]))
+    assert isinstance(repaired, list)
+    # Whatever survives is a prefix of the real slides.
+    for got, want in zip(repaired, SLIDES):
+        assert set(got) <= set(want)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('Buyurun:\n```json\n[{"a": 1,}, {"b": [1, 2,],},]\n```', [{"a": 1}, {"b": [1, 2]}]),
+    ('[{"a": "x \\" y', [{"a": 'x " y'}]),
+    ('[{"a": "x\\', [{"a": "x"}]),
+    ('[{"a": 12.', [{"a": 12}]),
+    ('[{"a": tr', [{}]),
+    ('[{"a": 1, "b"', [{"a": 1}]),
+    ('[{"a', [{}]),
+    ('[{"a": [1, -', [{"a": [1]}]),
+])
+def test_repair_json_cases(text, expected):
+    assert json.loads(repair_json(text)) == expected
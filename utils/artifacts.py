@@ -0,0 +1,48 @@
+import os
+import threading
+import time
+import uuid
+
+from utils.cache import CACHE_DIR, DiskCache
+
+
+# Finished decks live on disk, not in session state or job results: the
+# session keeps only the artifact id and downloads read the file on click.
+ARTIFACT_BYTES = int(os.environ.get("PPTX_ARTIFACT_BYTES", 2 * 1024 * 1024 * 1024))
+ARTIFACT_TTL = int(os.environ.get("PPTX_ARTIFACT_TTL", 24 * 3600))
+
+_artifact_store = None
+_artifact_store_lock = threading.Lock()
+
+
+def get_artifact_store():
+    global _artifact_store
+    with _artifact_store_lock:
+        if _artifact_store is None:
+            _artifact_store = DiskCache(os.path.join(CACHE_DIR, "artifacts"), max_bytes=ARTIFACT_BYTES,
+                                        suffix=".pptx", ttl=ARTIFACT_TTL)
+    return _artifact_store
+
+
+def put_artifact(data, store=None):
+    store = store or get_artifact_store()
+    artifact_id = uuid.uuid4().hex
+    store.set(artifact_id, data)
+    return artifact_id
+
+
+def get_artifact(artifact_id, store=None):
+    # None once the artifact has expired or been evicted to stay under the cap.
+    store = store or get_artifact_store()
+    return store.get(artifact_id)
+
+
+def has_artifact(artifact_id, store=None):
+    # Same expiry rule as DiskCache.get, without reading the file.
+    store = store or get_artifact_store()
+    try:
+        written = os.stat(store.path(artifact_id)).st_mtime
+    except FileNotFoundError:
+        return False
+    return store.ttl is None or time.time() - written <= store.ttl
+
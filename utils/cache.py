@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+
+CACHE_DIR = os.environ.get("PPTX_CACHE_DIR", ".cache")
+
+
+def cache_key(*parts):
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Content-addressed on-disk cache. Entries are plain files named by key.
+# File mtime records when an entry was written (for ttl expiry), atime is
+# bumped on every read and used as the LRU clock, and the directory is
+# trimmed back under max_bytes after every write.
+class DiskCache:
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, suffix="", ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        now = time.time()
+        if self.ttl is not None and now - stat.st_mtime > self.ttl:
+            self.delete(key)
+            with self._lock:
+                self.misses += 1
+                self.evictions += 1
+            return None
+
+        try:
+            os.utime(path, (now, stat.st_mtime))  # mark as recently used
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def set(self, key, data):
+        # Write to a temp file in the same directory and rename it into
+        # place, so readers never see a partially written entry.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".tmp-") or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        with self._lock:
+            if self.ttl is not None:
+                self._expire()
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                self.evictions += 1
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def _expire(self):
+        deadline = time.time() - self.ttl
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".tmp-") or not entry.is_file():
+                continue
+            try:
+                if entry.stat().st_mtime < deadline:
+                    os.remove(entry.path)
+                    self.evictions += 1
+            except FileNotFoundError:
+                continue
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+
+# Collapses concurrent calls for the same key into one: the first caller
+# runs fn, everyone else arriving while it is in flight waits for and
+# shares its result (or exception).
+class SingleFlight:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def _join(self, key, shared=True):
+        # Returns (call, leader).
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = {"done": threading.Event(), "result": None, "error": None, "shared": shared}
+            self._calls[key] = call
+            return call, True
+
+    def _finish(self, key, call):
+        with self._lock:
+            del self._calls[key]
+        call["done"].set()
+
+    def do(self, key, fn):
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            call["done"].wait()
+            if not call["shared"]:
+                continue  # a hold() has no result to share; run fn ourselves
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    @contextmanager
+    def hold(self, key):
+        # For work that can't run inside one call, such as a response
+        # streamed to the caller: the block runs for one caller per key at a
+        # time, and the others wait at the with statement. Nothing is
+        # handed over, so callers that waited should check the cache the
+        # first one filled.
+        while True:
+            call, leader = self._join(key, shared=False)
+            if leader:
+                break
+            call["done"].wait()
+        try:
+            yield
+        finally:
+            self._finish(key, call)
@@ -1,30 +1,41 @@
+import logging
+
 from pptx.util import Inches, Pt
 from pptx.chart.data import CategoryChartData
 from pptx.enum.chart import XL_CHART_TYPE, XL_DATA_LABEL_POSITION
 
+from utils.chart_data import prepare_pie, prepare_series
+
+
+logger = logging.getLogger(__name__)
 
 
 
 
-def add_chart(slide, chart_type, chart_title, x=None, y=None, xlabel=None, ylabel=None, labels=None, sizes=None):
+
+def add_chart(slide, chart_type, chart_title, x=None, y=None, xlabel=None, ylabel=None, labels=None, sizes=None,
+              box=None):
+    # Values may be the model's raw strings ("1,234", "12 %"); they are
+    # parsed, long series downsampled and small pie slices merged first.
+    # Returns the chart, or None when there is nothing to plot.
     chart_data = CategoryChartData()
 
     if chart_type == "pie":
-        if labels is not None and sizes is not None:
-            chart_data.categories = labels
-            chart_data.add_series("", sizes)
-        else:
-            print("Warning: Pie chart requires 'labels' and 'sizes' data.")
-            return  # Exit
+        prepared = prepare_pie(labels, sizes) if labels is not None and sizes is not None else None
+        if prepared is None:
+            logger.warning("Pie chart requires numeric 'labels' and 'sizes' data.")
+            return None
+        chart_data.categories, values = prepared
+        chart_data.add_series("", values)
     elif chart_type in ["bar", "line"]:
-        if x is not None and y is not None:
-            chart_data.categories = x
-            chart_data.add_series("", y)
-        else:
-            print(f"Warning: {chart_type} chart requires 'x' and 'y' data.")
-            return
+        prepared = prepare_series(x, y) if x is not None and y is not None else None
+        if prepared is None:
+            logger.warning("%s chart requires numeric 'x' and 'y' data.", chart_type)
+            return None
+        chart_data.categories, values = prepared
+        chart_data.add_series("", values)
     else:
-        print(f"Warning: Unsupported chart type: {chart_type}")
+        logger.warning("Unsupported chart type: %s", chart_type)
         return
 
 
@@ -39,9 +50,12 @@ def add_chart(slide, chart_type, chart_title, x=None, y=None, xlabel=None, ylabe
         return
 
 
-    placeholder = slide.placeholders[1]
+    # box: pre-resolved (left, top, width, height) of the content placeholder
+    placeholder = slide.placeholders[1] if box is None else None
 
-    if placeholder:
+    if box is not None:
+        left, top, width, height = box
+    elif placeholder:
         left = placeholder.left
         top = placeholder.top
         width = placeholder.width
@@ -80,4 +94,6 @@ def add_chart(slide, chart_type, chart_title, x=None, y=None, xlabel=None, ylabe
 
         if ylabel:
             value_axis.has_title = True
-            value_axis.axis_title.text_frame.text = ylabel
\ No newline at end of file
+            value_axis.axis_title.text_frame.text = ylabel
+
+    return chart
@@ -0,0 +1,131 @@
+import re
+
+import numpy as np
+
+
+MAX_POINTS = 40  # line/bar categories kept after downsampling
+PIE_MAX_SLICES = 6  # the smallest slices beyond this are merged into OTHER_LABEL
+OTHER_LABEL = "Digər"
+
+# Characters that decorate numbers in model output: "12 %", "1 234 ₼", "+5".
+NUMBER_JUNK = ('%', ' ', ' ', ' ', '$', '€', '₼', '£', '+')
+NUMBER_TOKEN = re.compile(r'-?\d[\d.,]*(?:[eE][+-]?\d+)?')
+# Words allowed next to a number ("12 mln AZN"); with anything else around
+# it ("2020-2021", "3 of 4") the entry is not a single figure and is NaN.
+NUMBER_UNITS = re.compile(r'(?:mln|milyon|mlrd|milyard|min|bn|k|azn|manat|man|usd|eur|faiz|\.)*')
+# Accounting negatives: "(12)" is -12.
+PARENTHESIZED = re.compile(r'^\((.*)\)$')
+
+
+def normalize_numbers(text):
+    # text: array of strings with the junk removed. Works out per element
+    # whether "," is a thousands separator ("1,234", "1,234,567") or the
+    # decimal point ("12,5", "1.234,5"), and returns plain "1234.5" forms.
+    commas = np.char.count(text, ',')
+    dots = np.char.count(text, '.')
+    last_comma = np.char.rfind(text, ',')
+    last_dot = np.char.rfind(text, '.')
+    digits_after_comma = np.char.str_len(text) - last_comma - 1
+
+    comma_decimal = (commas > 0) & np.where(
+        dots > 0, last_comma > last_dot, (commas == 1) & (digits_after_comma != 3)
+    )
+    dot_thousands = (commas == 0) & (dots > 1)
+
+    no_dots = np.char.replace(text, '.', '')
+    return np.where(
+        comma_decimal, np.char.replace(no_dots, ',', '.'),
+        np.where(dot_thousands, no_dots, np.char.replace(text, ',', ''))
+    )
+
+
+def parse_numbers(values):
+    # Model-supplied numbers -> float array; anything unparseable is NaN.
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        pass
+
+    text = np.asarray(
+        [PARENTHESIZED.sub(r'-\1', str(value).strip().replace('\u2212', '-')) for value in values], dtype=str
+    )
+    for junk in NUMBER_JUNK:
+        text = np.char.replace(text, junk, '')
+    text = normalize_numbers(text)
+    try:
+        return text.astype(float)
+    except ValueError:
+        pass
+
+    # Some entries carry units ("12 mln"): keep the number in each when the
+    # rest of it is a known unit, and parse those again.
+    numbers = np.full(len(text), np.nan)
+    found, tokens = [], []
+    for i, item in enumerate(text):
+        token = NUMBER_TOKEN.search(item)
+        if token and NUMBER_UNITS.fullmatch((item[:token.start()] + item[token.end():]).lower()):
+            found.append(i)
+            tokens.append(token.group(0))
+    if found:
+        numbers[found] = normalize_numbers(np.asarray(tokens)).astype(float)
+    return numbers
+
+
+def lttb(values, threshold):
+    # Largest-Triangle-Three-Buckets: indices of `threshold` points that
+    # keep the visual shape of the series (peaks and dips survive).
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    positions = np.arange(n, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = positions[end:next_end].mean()
+        avg_y = values[end:next_end].mean()
+        area = np.abs((positions[a] - avg_x) * (values[start:end] - values[a])
+                      - (positions[a] - positions[start:end]) * (avg_y - values[a]))
+        a = start + int(np.argmax(area))
+        selected.append(a)
+    selected.append(n - 1)
+    return np.asarray(selected)
+
+
+def prepare_series(x, y, max_points=MAX_POINTS):
+    # Bar/line data -> (categories, values) ready for CategoryChartData, or
+    # None when nothing numeric is left.
+    count = min(len(x), len(y))
+    categories = np.asarray([str(label) for label in x[:count]], dtype=object)
+    values = parse_numbers(list(y[:count]))
+    keep = ~np.isnan(values)
+    categories, values = categories[keep], values[keep]
+    if not len(values):
+        return None
+    if len(values) > max_points:
+        indices = lttb(values, max_points)
+        categories, values = categories[indices], values[indices]
+    return list(categories), values.tolist()
+
+
+def prepare_pie(labels, sizes, max_slices=PIE_MAX_SLICES):
+    # Pie data -> (labels, sizes) with non-positive or unparseable slices
+    # dropped and the smallest ones merged into one "other" slice.
+    count = min(len(labels), len(sizes))
+    names = np.asarray([str(label) for label in labels[:count]], dtype=object)
+    values = parse_numbers(list(sizes[:count]))
+    keep = values > 0  # NaN compares False
+    names, values = names[keep], values[keep]
+    if not len(values):
+        return None
+    if len(values) > max_slices:
+        order = np.argsort(values, kind="stable")[::-1]
+        top, rest = order[:max_slices - 1], order[max_slices - 1:]
+        top = np.sort(top)  # the kept slices stay in the model's order
+        names = np.append(names[top], OTHER_LABEL)
+        values = np.append(values[top], values[rest].sum())
+    return list(names), values.tolist()
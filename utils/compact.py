@@ -0,0 +1,175 @@
+import logging
+import math
+import os
+import re
+from collections import Counter
+
+from utils.metrics import span
+from utils.summarize import estimate_tokens
+
+
+# When set, documents still over this many tokens after clean-up are cut down
+# to their highest-ranked paragraphs. Unset, long documents are left to the
+# map-reduce summarizer instead.
+PROMPT_TOKEN_BUDGET = int(os.environ["PROMPT_TOKEN_BUDGET"]) if os.environ.get("PROMPT_TOKEN_BUDGET") else None
+BOILERPLATE_MIN_PAGES = 3
+BOILERPLATE_PAGE_SHARE = 0.5  # a line on at least this share of pages is a header/footer
+EDGE_LINES = 2  # lines at the top and bottom of a page that may be headers/footers
+CLEAN_MIN_SHARE = 0.3  # cleaning that keeps less than this of the text has misfired
+DEDUPE_MIN_CHARS = 40  # shorter repeats (table cells, labels) are kept
+
+PAGE_NUMBER = re.compile(r'^(səhifə|səh\.?|page|p\.)?\s*\d+(\s*(/|of|-)\s*\d+)?$', re.IGNORECASE)
+WORD = re.compile(r'\w+', re.UNICODE)
+
+logger = logging.getLogger(__name__)
+
+
+def split_lines(text):
+    return [line for line in (re.sub(r'\s+', ' ', line).strip() for line in re.split(r'[\n\f]', text)) if line]
+
+
+def normalize_line(line):
+    # Digits are masked so "Hesabat 2023 — səhifə 4" matches across pages.
+    return re.sub(r'\d+', '#', line.lower())
+
+
+def edge_positions(lines):
+    # Headers and footers only ever sit at the top or bottom of a page;
+    # short pages get fewer edge lines so their body is never all "edge".
+    count = max(1, min(EDGE_LINES, len(lines) // 3))
+    return set(range(min(count, len(lines)))) | set(range(max(len(lines) - count, 0), len(lines)))
+
+
+def find_boilerplate(pages):
+    if len(pages) < BOILERPLATE_MIN_PAGES:
+        return set()
+    counts = Counter()
+    for lines in pages:
+        counts.update({normalize_line(lines[position]) for position in edge_positions(lines)})
+    threshold = max(BOILERPLATE_MIN_PAGES, BOILERPLATE_PAGE_SHARE * len(pages))
+    return {line for line, count in counts.items() if count >= threshold}
+
+
+def clean_lines(text, stats):
+    pages = [
+        [re.sub(r'\s+', ' ', line).strip() for line in page.split('\n')]
+        for page in text.split('\f')
+    ]
+    pages = [[line for line in lines if line] for lines in pages]
+    boilerplate = find_boilerplate(pages)
+
+    # Page numbers and repeated headers/footers are only looked for at the
+    # edges of form-feed pages; anywhere else (and in DOCX text, which has
+    # no pages) a repeated or numeric line is data such as a chart figure.
+    multi_page = len(pages) > 1
+    seen = set()
+    kept = []
+    for lines in pages:
+        edges = edge_positions(lines) if multi_page else set()
+        for position, line in enumerate(lines):
+            if position in edges and (PAGE_NUMBER.match(line) or normalize_line(line) in boilerplate):
+                stats["boilerplate_lines"] += 1
+                continue
+            if len(line) >= DEDUPE_MIN_CHARS:
+                key = line.lower()
+                if key in seen:
+                    stats["duplicate_lines"] += 1
+                    continue
+                seen.add(key)
+            kept.append(line)
+    return kept
+
+
+def rank_paragraphs(paragraphs):
+    # TF-IDF salience: paragraphs made of terms that are frequent in the
+    # paragraph but rare in the document score highest.
+    tokenized = [WORD.findall(paragraph.lower()) for paragraph in paragraphs]
+    document_frequency = Counter()
+    for terms in tokenized:
+        document_frequency.update(set(terms))
+    total = len(paragraphs)
+
+    scores = []
+    for terms in tokenized:
+        if not terms:
+            scores.append(0.0)
+            continue
+        tf = Counter(terms)
+        weight = sum(count * math.log(1 + total / document_frequency[term]) for term, count in tf.items())
+        scores.append(weight / math.sqrt(len(terms)))
+    return scores
+
+
+def select_paragraphs(paragraphs, token_budget, stats):
+    scores = rank_paragraphs(paragraphs)
+    order = sorted(range(len(paragraphs)), key=lambda i: scores[i], reverse=True)
+
+    keep = set()
+    used = 0
+    for i in order:
+        tokens = estimate_tokens(paragraphs[i]) + 1
+        if used + tokens > token_budget:
+            continue
+        keep.add(i)
+        used += tokens
+
+    stats["dropped_paragraphs"] = len(paragraphs) - len(keep)
+    # Original order is kept so the document still reads top to bottom.
+    return [paragraph for i, paragraph in enumerate(paragraphs) if i in keep]
+
+
+def compact_text(text, token_budget=PROMPT_TOKEN_BUDGET):
+    # Cheap pre-processing before the document goes into a prompt: drops
+    # repeated headers/footers and page numbers, collapses whitespace,
+    # removes duplicate paragraphs and, over token_budget, keeps only the
+    # highest-ranked paragraphs. Returns (text, stats).
+    stats = {"boilerplate_lines": 0, "duplicate_lines": 0, "dropped_paragraphs": 0}
+    with span("compact") as record:
+        lines = clean_lines(text, stats)
+        if estimate_tokens('\n'.join(lines)) < CLEAN_MIN_SHARE * estimate_tokens(text):
+            logger.warning("Clean-up removed most of the document; using it uncompacted.")
+            lines = split_lines(text)
+            stats.update(boilerplate_lines=0, duplicate_lines=0)
+        if token_budget and estimate_tokens('\n'.join(lines)) > token_budget:
+            lines = select_paragraphs(lines, token_budget, stats)
+        compacted = '\n'.join(lines)
+
+        stats["tokens_before"] = estimate_tokens(text)
+        stats["tokens_after"] = estimate_tokens(compacted)
+        stats["tokens_saved"] = stats["tokens_before"] - stats["tokens_after"]
+        record["counters"].update(stats)
+
+    logger.info("Compacted document: %d -> %d tokens (%d saved).",
+                stats["tokens_before"], stats["tokens_after"], stats["tokens_saved"])
+    return compacted, stats
+
+
+def relevant_excerpt(text, query, token_budget):
+    # The paragraphs of text that share the most (IDF-weighted) terms with
+    # query, up to token_budget and in document order. Used to give a
+    # single-slide request just the part of the document it is about.
+    paragraphs = split_lines(text)
+    if estimate_tokens('\n'.join(paragraphs)) <= token_budget:
+        return '\n'.join(paragraphs)
+
+    tokenized = [set(WORD.findall(paragraph.lower())) for paragraph in paragraphs]
+    document_frequency = Counter()
+    for terms in tokenized:
+        document_frequency.update(terms)
+    query_terms = set(WORD.findall(query.lower()))
+    scores = [
+        sum(math.log(1 + len(paragraphs) / document_frequency[term]) for term in terms & query_terms)
+        for terms in tokenized
+    ]
+
+    keep = set()
+    used = 0
+    for i in sorted(range(len(paragraphs)), key=lambda i: scores[i], reverse=True):
+        if scores[i] <= 0:
+            break
+        tokens = estimate_tokens(paragraphs[i]) + 1
+        if used + tokens > token_budget:
+            continue
+        keep.add(i)
+        used += tokens
+    return '\n'.join(paragraph for i, paragraph in enumerate(paragraphs) if i in keep)
@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import threading
+import uuid
+import zlib
+
+from utils.cache import CACHE_DIR, DiskCache
+from utils.compact import relevant_excerpt
+from utils.llm import DEFAULT_MODEL
+from utils.metrics import span
+from utils.prompt import SLIDES_CONFIG, cached_generate, is_error_response, slide_repairer
+from utils.schema import has_valid_slide, slide_errors
+from utils.slide import decode_slide, generate_pptx, resolve_slides, validate_slide
+
+
+DECK_CACHE_BYTES = 256 * 1024 * 1024
+DECK_TTL = 7 * 24 * 3600
+SLIDE_CONTEXT_TOKENS = 3000  # document excerpt sent when one slide is regenerated
+
+logger = logging.getLogger(__name__)
+
+_deck_store = None
+_deck_store_lock = threading.Lock()
+
+
+def get_deck_store():
+    global _deck_store
+    with _deck_store_lock:
+        if _deck_store is None:
+            _deck_store = DiskCache(os.path.join(CACHE_DIR, "decks"), max_bytes=DECK_CACHE_BYTES,
+                                    suffix=".json.z", ttl=DECK_TTL)
+    return _deck_store
+
+
+# A deck model is the parsed slide list plus what is needed to work on it
+# again later: the source document and the generation settings. Chart data
+# lives in the slides themselves and generated pictures in the shared image
+# cache, so reassembling a deck only re-runs the cheap python-pptx part.
+def new_deck(slides, document, slide_count, include_visuals, model_name=DEFAULT_MODEL):
+    return {
+        "id": uuid.uuid4().hex,
+        "slides": list(slides),
+        "document": document,
+        "slide_count": slide_count,
+        "include_visuals": include_visuals,
+        "model": model_name,
+    }
+
+
+def save_deck(deck, store=None):
+    store = store or get_deck_store()
+    store.set(deck["id"], zlib.compress(json.dumps(deck, ensure_ascii=False).encode("utf-8"), 6))
+    return deck["id"]
+
+
+def load_deck(deck_id, store=None):
+    store = store or get_deck_store()
+    data = store.get(deck_id)
+    if data is None:
+        raise KeyError(f"Deck {deck_id} not found or expired.")
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def slide_query(slide):
+    # The slide's own text, used to find the part of the document it covers.
+    return " ".join(str(value) for key, value in slide.items() if key not in ("type", "visual"))
+
+
+def build_slide_prompt(deck, index, instruction=None):
+    slide = deck["slides"][index]
+    excerpt = relevant_excerpt(deck["document"], slide_query(slide), SLIDE_CONTEXT_TOKENS)
+    outline = "\n".join(
+        f"{i}. [{other.get('type')}] {other.get('title', '')}" for i, other in enumerate(deck["slides"])
+    )
+    request = instruction or "Slaydı sənədə əsaslanaraq yenidən, daha yaxşı şəkildə yaz."
+    return f"""
+Təqdimatın bir slaydını yenidən hazırla. Digər slaydlar dəyişmir, onların mövzularını təkrarlama.
+
+TƏQDİMATIN PLANI:
+{outline}
+
+DƏYİŞDİRİLƏCƏK SLAYD ({index}):
+{json.dumps(slide, ensure_ascii=False, indent=2)}
+
+İSTİFADƏÇİNİN İSTƏYİ:
+{request}
+
+SƏNƏDDƏN MÜVAFİQ HİSSƏ:
+\"\"\"
+{excerpt}
+\"\"\"
+
+Slaydın type sahəsini və eyni JSON strukturunu saxla. Məzmun yalnız sənədə əsaslanmalıdır.
+CAVABI YALNIZ BİR JSON OBYEKTİ KİMİ QAYTAR.
+"""
+
+
+def regenerate_slide(deck, index, instruction=None, use_cache=True):
+    # One focused call: the slide, the deck outline and only the document
+    # paragraphs relevant to this slide, instead of the whole document.
+    model_name = deck.get("model", DEFAULT_MODEL)
+    expected = deck["slides"][index].get("type")
+    with span("slide_regenerate", index=index):
+        response_text = cached_generate(build_slide_prompt(deck, index, instruction), model_name,
+                                        use_cache, SLIDES_CONFIG, validate=has_valid_slide)
+    if is_error_response(response_text):
+        raise ValueError(f"Slide regeneration failed: {response_text}")
+
+    slide, errors = decode_slide(response_text)
+    if isinstance(slide, list) and len(slide) == 1:
+        slide = slide[0]
+        errors = slide_errors(slide)
+    # The slide keeps its place in the deck, so a reply of another type
+    # (an intro where a chart slide was) goes to the repairer like any
+    # other invalid one, and is refused if it still doesn't fit.
+    if not errors and slide.get("type") != expected:
+        errors = [f"must keep type '{expected}', got {slide.get('type')!r}"]
+    if errors:
+        slide = resolve_slides([(index, response_text, slide, errors)], slide_repairer(model_name, use_cache))[index]
+    if slide.get("type") != expected:
+        raise ValueError(f"Slide {index} must keep type '{expected}', got {slide.get('type')!r}")
+    deck["slides"][index] = slide
+    return slide
+
+
+def edit_slide(deck, index, slide):
+    validate_slide(index, slide)
+    deck["slides"][index] = slide
+    return slide
+
+
+def render_deck(deck, **options):
+    # Unchanged image slides are served from the image cache, so only the
+    # slides that changed cost anything beyond rebuilding the PPTX.
+    with span("render_deck", slides=len(deck["slides"])):
+        return generate_pptx(deck["slides"], output=None, **options)
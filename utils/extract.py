@@ -0,0 +1,277 @@
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from utils.cache import CACHE_DIR, DiskCache
+from utils.metrics import span
+
+
+# pdfplumber is imported where it is used, so loading this module (and the
+# app) doesn't pay for it until a file is read.
+PDF_WORKERS = os.cpu_count() or 1  # size of the one extraction pool per process
+PARALLEL_MIN_PAGES = 40  # below this the process pool costs more than it saves
+
+# Bump whenever extraction output changes so stale cache entries are ignored.
+EXTRACTOR_VERSION = 3
+EXTRACTION_CACHE_BYTES = 256 * 1024 * 1024
+
+_extraction_cache = None
+_extraction_cache_lock = threading.Lock()
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def get_extraction_cache():
+    global _extraction_cache
+    with _extraction_cache_lock:
+        if _extraction_cache is None:
+            _extraction_cache = DiskCache(os.path.join(CACHE_DIR, "extracted"), max_bytes=EXTRACTION_CACHE_BYTES,
+                                          suffix=".txt.z")
+    return _extraction_cache
+
+
+def open_source(source):
+    # Extractors accept either a path or the raw file bytes.
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return source
+
+
+def select_pages(page_count, max_pages=None, sample=None):
+    # max_pages keeps the first N pages; sample picks N pages spread evenly
+    # across the whole document (useful for previews of huge files).
+    if sample and sample < page_count:
+        step = page_count / sample
+        return [int(i * step) for i in range(sample)]
+    if max_pages:
+        return list(range(min(page_count, max_pages)))
+    return list(range(page_count))
+
+
+def pdf_page_count(source):
+    import pdfplumber
+
+    with pdfplumber.open(open_source(source)) as pdf:
+        return len(pdf.pages)
+
+
+def iter_pdf_pages(source, pages=None):
+    # Yields the text of each page as soon as it is extracted, releasing the
+    # page's parsed objects before moving on.
+    import pdfplumber
+
+    with pdfplumber.open(open_source(source)) as pdf:
+        indexes = range(len(pdf.pages)) if pages is None else pages
+        for index in indexes:
+            page = pdf.pages[index]
+            page_text = page.extract_text()
+            page.close()
+            if page_text:
+                yield page_text
+
+
+def extract_page_range(source, pages):
+    return list(iter_pdf_pages(source, pages))
+
+
+def split_ranges(pages, parts):
+    size = -(-len(pages) // parts)
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+
+def get_pdf_pool():
+    # Shared by every request in the process, so concurrent uploads queue
+    # for the same PDF_WORKERS processes instead of each starting their own.
+    # Workers come from a fork server (spawn where there is none): forking
+    # the multi-threaded app or job process can deadlock the child.
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context(method))
+    return _pdf_pool
+
+
+def discard_pdf_pool(pool):
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    pool.shutdown(wait=False)
+
+
+@contextmanager
+def source_path(source):
+    # Workers get a path rather than a pickled copy of the whole file:
+    # uploaded bytes are written to one temp file for the length of the read.
+    if not isinstance(source, (bytes, bytearray)):
+        yield source
+        return
+    fd, path = tempfile.mkstemp(prefix="pptx-upload-", suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        yield path
+    finally:
+        os.remove(path)
+
+
+def extract_parallel(source, pages, workers):
+    # Each worker opens the file itself and extracts a contiguous page range.
+    ranges = split_ranges(pages, workers)
+    pool = get_pdf_pool()
+    with source_path(source) as path:
+        try:
+            results = list(pool.map(extract_page_range, [path] * len(ranges), ranges))
+        except BrokenProcessPool:
+            # A worker died (killed for memory, say): later requests get a
+            # fresh pool and this one finishes in-process.
+            logger.warning("PDF extraction pool broke; reading %d pages in-process.", len(pages))
+            discard_pdf_pool(pool)
+            results = [extract_page_range(path, pages)]
+    return [text for texts in results for text in texts]
+
+
+def read_pdf(file_path, workers=PDF_WORKERS, max_pages=None, sample=None):
+    pages = select_pages(pdf_page_count(file_path), max_pages, sample)
+    workers = min(workers, PDF_WORKERS)
+
+    if workers <= 1 or len(pages) < PARALLEL_MIN_PAGES:
+        page_texts = iter_pdf_pages(file_path, pages)
+    else:
+        page_texts = extract_parallel(file_path, pages, workers)
+
+    # Pages are separated by form feeds so later stages can tell where page
+    # headers and footers are.
+    return '\f'.join(page_texts).strip()
+
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def iter_docx_blocks(source):
+    # Streams word/document.xml and yields paragraphs and table rows (cells
+    # joined with " | ") in document order. Finished paragraphs and table
+    # rows are dropped as they are read, so memory stays flat however large
+    # the file or any one table is.
+    # A table nested in a cell becomes part of that cell's text.
+    from xml.etree.ElementTree import iterparse
+
+    body = None
+    paragraph = []
+    tables = []  # one {"elem": tbl, "row": [...], "cell": [...]} per open table
+    in_run = 0
+
+    with zipfile.ZipFile(open_source(source)) as archive, archive.open("word/document.xml") as xml:
+        for event, elem in iterparse(xml, events=("start", "end")):
+            tag = elem.tag[len(WORD_NS):] if elem.tag.startswith(WORD_NS) else None
+            if event == "start":
+                if tag == "body":
+                    body = elem
+                elif tag == "r":
+                    in_run += 1
+                elif tag == "tbl":
+                    tables.append({"elem": elem, "row": [], "cell": []})
+                continue
+
+            if tag == "t":
+                paragraph.append(elem.text or "")
+            elif tag == "r":
+                in_run -= 1
+            elif tag in ("tab", "br", "cr") and in_run:
+                paragraph.append("\t" if tag == "tab" else " ")
+            elif tag == "p":
+                text = "".join(paragraph).strip()
+                paragraph = []
+                if tables:
+                    if text:
+                        tables[-1]["cell"].append(text)
+                elif text:
+                    yield text
+            elif tag == "tc":
+                table = tables[-1]
+                table["row"].append(" ".join(table["cell"]))
+                table["cell"] = []
+                elem.clear()
+            elif tag == "tr":
+                table = tables[-1]
+                row = " | ".join(table["row"])
+                table["row"] = []
+                # Rows are dropped as they finish, not at </w:tbl>: one
+                # huge table would otherwise stay in memory whole.
+                elem.clear()
+                try:
+                    table["elem"].remove(elem)
+                except ValueError:
+                    pass  # row wrapped in a content control; cleared is enough
+                if row.replace("|", "").strip():
+                    if len(tables) == 1:
+                        yield row
+                    else:
+                        tables[-2]["cell"].append(row)
+            elif tag == "tbl":
+                tables.pop()
+
+            # Everything under body is finished once a top-level block ends.
+            if tag in ("p", "tbl") and not tables and body is not None:
+                body.clear()
+
+
+def read_docx(file_path):
+    return '\n'.join(iter_docx_blocks(file_path))
+
+
+def read_file(file_path, filename=None, **options):
+    # file_path may also be the file's bytes, in which case filename supplies
+    # the extension.
+    ext = os.path.splitext(filename or file_path)[1].lower()
+
+    if ext == '.docx':
+        return read_docx(file_path)
+
+    elif ext == '.pdf':
+        return read_pdf(file_path, **options)
+    else:
+        raise ValueError("Unsupported file format: Only .docx and .pdf are supported.")
+
+
+def extraction_key(data, ext, options):
+    # workers only changes how the text is extracted, not the text itself.
+    options = {name: value for name, value in options.items() if name != "workers"}
+    digest = hashlib.sha256(data)
+    digest.update(f"|{ext}|v{EXTRACTOR_VERSION}|{sorted(options.items())}".encode())
+    return digest.hexdigest()
+
+
+def read_upload(data, filename, use_cache=True, **options):
+    # Extracts an uploaded file straight from memory. Results are cached,
+    # zlib-compressed, by content hash so re-uploads skip parsing entirely.
+    ext = os.path.splitext(filename)[1].lower()
+    if not use_cache:
+        with span("file_read", ext=ext):
+            return read_file(data, filename, **options)
+
+    with span("file_read", ext=ext) as record:
+        record["counters"]["bytes"] = len(data)
+        cache = get_extraction_cache()
+        key = extraction_key(data, ext, options)
+        cached = cache.get(key)
+        if cached is not None:
+            record["attributes"]["cached"] = True
+            return zlib.decompress(cached).decode("utf-8")
+
+        text = read_file(data, filename, **options)
+        cache.set(key, zlib.compress(text.encode("utf-8"), 6))
+        record["counters"]["chars"] = len(text)
+        return text
@@ -0,0 +1,171 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from utils.cache import CACHE_DIR, DiskCache, cache_key
+from utils.metrics import span, submit_in_context
+from utils.prompt import IMAGE_MODEL, IMAGE_SIZE, IMAGE_TIMEOUT, generate_image_hf
+from utils.translate import get_translation_service
+from utils.visuals import get_visual_index
+
+
+IMAGE_WORKERS = 4
+IMAGE_CACHE_BYTES = 1024 * 1024 * 1024
+IMAGE_CONCURRENCY = 4  # image inference calls in flight across all decks in this process
+
+logger = logging.getLogger(__name__)
+
+_image_cache = None
+_image_cache_lock = threading.Lock()
+_inference_slots = threading.BoundedSemaphore(IMAGE_CONCURRENCY)
+
+
+def get_image_cache():
+    global _image_cache
+    with _image_cache_lock:
+        if _image_cache is None:
+            _image_cache = DiskCache(os.path.join(CACHE_DIR, "images"), max_bytes=IMAGE_CACHE_BYTES, suffix=".png")
+    return _image_cache
+
+
+def image_path_for(index, visual, directory="."):
+    filename = f"generated_image_{index}_{visual.get('title', '')[:10].replace(' ', '_')}.png"
+    return os.path.join(directory, filename)
+
+
+def image_job_for(index, slide, directory="."):
+    if slide.get('type') != 'main':
+        return None
+    visual = slide.get('visual') or {}
+    if visual.get('type') != 'image':
+        return None
+    return {
+        "index": index,
+        "description": visual.get("description", ""),
+        # Set when the model was asked for English image prompts directly.
+        "english_description": visual.get("description_en") or None,
+        "output_path": image_path_for(index, visual, directory),
+    }
+
+
+def generate_image(backend, prompt, output_path, model, timeout=IMAGE_TIMEOUT):
+    # The slot wait is bounded too, so calls stuck in a backend without a
+    # timeout of its own cannot starve every later job in the process.
+    if not _inference_slots.acquire(timeout=timeout):
+        raise TimeoutError(f"No image inference slot free after {timeout}s.")
+    try:
+        with span("image_generation", model=model, prompt_chars=len(prompt)) as record:
+            backend(prompt, output_path)
+            record["counters"]["bytes"] = os.path.getsize(output_path)
+    finally:
+        _inference_slots.release()
+
+
+def run_image_job(job, backend, translate, cache=None, model=IMAGE_MODEL, size=IMAGE_SIZE, resolver=None):
+    # resolver (utils.visuals.VisualIndex) is tried first, with the original
+    # description and again with the English one, so stock pictures skip
+    # both translation and diffusion.
+    english_description = job.get("english_description")
+    if resolver is not None and resolver.resolve(f"{job['description']} {english_description or ''}",
+                                                 job["output_path"]):
+        return job["output_path"]
+    if not english_description:
+        with span("translation", chars=len(job["description"])):
+            english_description = translate(job["description"])
+        if resolver is not None and resolver.resolve(english_description, job["output_path"]):
+            return job["output_path"]
+    logger.info("Image prompt: %s", english_description)
+
+    if cache is None:
+        generate_image(backend, english_description, job["output_path"], model)
+        return job["output_path"]
+
+    key = cache_key(model, english_description, list(size))
+    data = cache.get(key)
+    if data is not None:
+        with span("image_cache_hit"), open(job["output_path"], "wb") as f:
+            f.write(data)
+        return job["output_path"]
+
+    generate_image(backend, english_description, job["output_path"], model)
+    with open(job["output_path"], "rb") as f:
+        cache.set(key, f.read())
+    return job["output_path"]
+
+
+# Runs translate + image generation jobs on a bounded thread pool.
+class ImagePipeline:
+
+    def __init__(self, backend=None, translate=None, max_workers=IMAGE_WORKERS, timeout=IMAGE_TIMEOUT,
+                 cache=None, model=IMAGE_MODEL, size=IMAGE_SIZE, postprocess=None, resolver=None):
+        self.backend = backend or generate_image_hf
+        # translate: callable(az_text) -> en_text; defaults to the shared
+        # memoizing translation service.
+        self.translation_service = None if translate else get_translation_service()
+        self.translate = translate or self.translation_service.translate
+        self.timeout = timeout
+        # cache=False disables caching; None uses the shared on-disk image cache.
+        self.cache = get_image_cache() if cache is None else (cache or None)
+        self.model = model
+        self.size = size
+        # postprocess: callable(path) -> path run on each finished image
+        # (see utils.media.MediaOptimizer); failures keep the original.
+        self.postprocess = postprocess
+        # resolver=False skips the stock picture index; None uses the
+        # shared one when it has been built.
+        self.resolver = get_visual_index() if resolver is None else (resolver or None)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image")
+
+    def prefetch_translations(self, jobs):
+        # Translate every description in one batched call up front; the jobs
+        # then find their text in the service's memo.
+        if self.translation_service is None:
+            return
+        descriptions = [
+            job["description"] for job in jobs
+            if not job.get("english_description")
+            and (self.resolver is None or self.resolver.match(job["description"]) is None)
+        ]
+        if descriptions:
+            try:
+                self.translation_service.translate_many(descriptions)
+            except Exception as e:
+                logger.warning("Batched translation failed, translating per image: %s", e)
+
+    def submit(self, job):
+        future = submit_in_context(self.executor, self._run, job)
+        # The timeout counts from submission, so jobs waited on one after
+        # another share it instead of each getting a fresh one.
+        future.deadline = time.monotonic() + self.timeout
+        return future
+
+    def _run(self, job):
+        path = run_image_job(job, self.backend, self.translate, self.cache, self.model, self.size, self.resolver)
+        if self.postprocess is None:
+            return path
+        try:
+            return self.postprocess(path)
+        except Exception as e:
+            logger.warning("Image post-processing failed, embedding the original: %s", e)
+            return path
+
+    def result(self, future):
+        # Returns the image path, or None if the job failed or timed out.
+        try:
+            return future.result(timeout=max(0, future.deadline - time.monotonic()))
+        except FutureTimeoutError:
+            logger.warning("Image generation timed out after %ss.", self.timeout)
+        except Exception as e:
+            logger.error("Error generating image: %s", e)
+        return None
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
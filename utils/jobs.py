@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import trace
+
+
+JOB_WORKERS = 4  # decks generated at the same time across all sessions
+JOB_TTL = 3600  # finished jobs are forgotten after this many seconds
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"  # queued | running | done | failed
+        self.stage = "queued"
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.updated = time.time()
+
+    def report(self, stage, progress):
+        self.stage = stage
+        self.progress = progress
+        self.updated = time.time()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+
+# Runs jobs on a process-wide worker pool. Jobs live in this module, not in
+# the Streamlit script, so they keep running (and stay reachable by id)
+# across reruns of the page.
+class JobManager:
+
+    def __init__(self, max_workers=JOB_WORKERS, ttl=JOB_TTL):
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        # fn receives the keyword argument report=job.report for progress.
+        job = Job()
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self.executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.report("running", 0.0)
+        try:
+            with trace(job.id):
+                job.result = fn(*args, report=job.report, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            logger.exception("Job %s failed: %s", job.id, e)
+            job.error = str(e)
+            job.status = "failed"
+        job.updated = time.time()
+
+    def _prune(self):
+        deadline = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.updated < deadline]:
+            del self._jobs[job_id]
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+    return _manager
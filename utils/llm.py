@@ -0,0 +1,294 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from utils.ratelimit import get_rate_limiter
+from utils.summarize import estimate_tokens
+
+
+DEFAULT_MODEL = os.environ.get("LLM_MODEL", 'gemini-1.5-flash')
+LLM_CONCURRENCY = 8  # model calls in flight per process, across all sessions
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+OUTPUT_TOKEN_RESERVE = 4096  # reserved against the tokens-per-minute quota until usage is known
+
+logger = logging.getLogger(__name__)
+
+
+def is_rate_limited(error):
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    name = type(error).__name__
+    return name in ("ResourceExhausted", "TooManyRequests") or "429" in str(error)
+
+
+def backoff_delay(attempt):
+    # "Full jitter": a random delay up to the exponential bound, so many
+    # sessions hitting the same limit don't retry in lockstep.
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def reserve_tokens(prompt, config):
+    return estimate_tokens(prompt) + (config or {}).get("max_output_tokens", OUTPUT_TOKEN_RESERVE)
+
+
+def used_tokens(usage):
+    return (usage.get("prompt_tokens") or 0) + (usage.get("response_tokens") or 0)
+
+
+# Base class for model providers. Subclasses implement _generate (returns
+# (text, usage)) and _stream (yields text chunks); this class adds the
+# cross-process rate limiter (utils.ratelimit), the shared concurrency
+# limit, rate-limit retries and the async wrappers.
+class LLMBackend:
+
+    name = "base"
+
+    def __init__(self, max_concurrency=LLM_CONCURRENCY, max_retries=MAX_RETRIES):
+        self.max_retries = max_retries
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # A stream holds its slot across yields while the consumer may make
+        # generate calls (slide repairs) of its own, so streams count against
+        # a separate limit; sharing one would deadlock once every slot is
+        # held by a stream waiting on a repair.
+        self._stream_slots = threading.BoundedSemaphore(max_concurrency)
+
+    def generate(self, prompt, model_name=DEFAULT_MODEL, system=None, config=None):
+        # Returns (text, usage) where usage is a dict with prompt_tokens /
+        # response_tokens when the provider reports them.
+        for attempt in range(self.max_retries + 1):
+            try:
+                reservation = get_rate_limiter().acquire(self.name, model_name, reserve_tokens(prompt, config))
+                try:
+                    with self._slots:
+                        text, usage = self._generate(prompt, model_name, system, config or {})
+                except BaseException:
+                    # A failed call (a 429 included) used no tokens; the
+                    # retry reserves its own.
+                    reservation.settle(0)
+                    raise
+                reservation.settle(used_tokens(usage) or estimate_tokens(prompt) + estimate_tokens(text))
+                return text, usage
+            except Exception as e:
+                if attempt == self.max_retries or not is_rate_limited(e):
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning("%s rate limited, retrying in %.1fs: %s", self.name, delay, e)
+                time.sleep(delay)
+
+    def stream(self, prompt, model_name=DEFAULT_MODEL, system=None, config=None):
+        # Retries only until the first chunk arrives; a stream that fails
+        # halfway cannot be resumed transparently.
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                reservation = get_rate_limiter().acquire(self.name, model_name, reserve_tokens(prompt, config))
+                streamed = 0
+                try:
+                    with self._stream_slots:
+                        for chunk in self._stream(prompt, model_name, system, config or {}):
+                            started = True
+                            streamed += len(chunk)
+                            yield chunk
+                finally:
+                    # Also runs when the stream fails or the consumer stops
+                    # reading: only what was actually streamed is charged.
+                    reservation.settle(estimate_tokens(prompt) + streamed // 4 if started else 0)
+                return
+            except Exception as e:
+                if started or attempt == self.max_retries or not is_rate_limited(e):
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning("%s rate limited, retrying in %.1fs: %s", self.name, delay, e)
+                time.sleep(delay)
+
+    async def agenerate(self, prompt, model_name=DEFAULT_MODEL, system=None, config=None):
+        return await asyncio.to_thread(self.generate, prompt, model_name, system, config)
+
+    def _generate(self, prompt, model_name, system, config):
+        raise NotImplementedError
+
+    def _stream(self, prompt, model_name, system, config):
+        text, _ = self._generate(prompt, model_name, system, config)
+        yield text
+
+
+class GeminiBackend(LLMBackend):
+
+    name = "gemini"
+
+    def __init__(self, api_key, **kwargs):
+        super().__init__(**kwargs)
+        import google.generativeai as genai
+
+        self.genai = genai
+        genai.configure(api_key=api_key)
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def model(self, model_name, system):
+        # GenerativeModel instances share the configured client, so keeping
+        # one per (model, system instruction) avoids rebuilding them.
+        with self._lock:
+            key = (model_name, system)
+            if key not in self._models:
+                self._models[key] = self.genai.GenerativeModel(model_name=model_name, system_instruction=system)
+            return self._models[key]
+
+    def _request(self, prompt, model_name, system, config, stream=False):
+        from google.generativeai.types import GenerationConfig
+
+        return self.model(model_name, system).generate_content(
+            contents=[
+                {"role": "user", "parts": [{"text": prompt}]}
+            ],
+            generation_config=GenerationConfig(**config),
+            stream=stream
+        )
+
+    def _generate(self, prompt, model_name, system, config):
+        response = self._request(prompt, model_name, system, config)
+        if not (response.candidates and response.candidates[0].content and response.candidates[0].content.parts):
+            raise ValueError("Model did not return expected content structure.")
+        usage = getattr(response, "usage_metadata", None)
+        return response.candidates[0].content.parts[0].text, {
+            "prompt_tokens": getattr(usage, "prompt_token_count", 0),
+            "response_tokens": getattr(usage, "candidates_token_count", 0),
+        }
+
+    def _stream(self, prompt, model_name, system, config):
+        for chunk in self._request(prompt, model_name, system, config, stream=True):
+            if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
+                yield chunk.candidates[0].content.parts[0].text
+
+
+# Any server speaking the OpenAI chat completions API (vLLM, Ollama, LM
+# Studio, OpenRouter...). One requests.Session keeps connections alive.
+class OpenAICompatibleBackend(LLMBackend):
+
+    name = "openai"
+
+    def __init__(self, base_url, api_key=None, timeout=300, **kwargs):
+        super().__init__(**kwargs)
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=LLM_CONCURRENCY)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def _payload(self, prompt, model_name, system, config, stream):
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        payload = {"model": model_name, "messages": messages, "stream": stream}
+        if "temperature" in config:
+            payload["temperature"] = config["temperature"]
+        if "max_output_tokens" in config:
+            payload["max_tokens"] = config["max_output_tokens"]
+        return payload
+
+    def _generate(self, prompt, model_name, system, config):
+        response = self.session.post(f"{self.base_url}/chat/completions",
+                                     json=self._payload(prompt, model_name, system, config, False),
+                                     timeout=self.timeout)
+        response.raise_for_status()
+        body = response.json()
+        usage = body.get("usage") or {}
+        return body["choices"][0]["message"]["content"], {
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "response_tokens": usage.get("completion_tokens", 0),
+        }
+
+    def _stream(self, prompt, model_name, system, config):
+        with self.session.post(f"{self.base_url}/chat/completions",
+                               json=self._payload(prompt, model_name, system, config, True),
+                               timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                line = line.decode("utf-8") if isinstance(line, bytes) else line
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+
+# Local stand-in for tests and offline runs. respond(prompt) -> text.
+class FakeBackend(LLMBackend):
+
+    name = "fake"
+
+    def __init__(self, respond=None, latency=0.0, chunk_size=256, **kwargs):
+        super().__init__(**kwargs)
+        self.respond = respond or (lambda prompt: "[]")
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    def _generate(self, prompt, model_name, system, config):
+        self.calls += 1
+        time.sleep(self.latency)
+        return self.respond(prompt), {}
+
+    def _stream(self, prompt, model_name, system, config):
+        text, _ = self._generate(prompt, model_name, system, config)
+        for i in range(0, len(text), self.chunk_size):
+            yield text[i:i + self.chunk_size]
+
+
+def setting(name, default=None):
+    # Environment variables win over Streamlit secrets. Streamlit is only
+    # imported here so headless use (batch.py) doesn't pay for it.
+    if os.environ.get(name):
+        return os.environ[name]
+    try:
+        import streamlit as st
+
+        return st.secrets[name]
+    except Exception:
+        return default
+
+
+def create_backend():
+    provider = setting("LLM_PROVIDER", "gemini")
+    if provider == "gemini":
+        return GeminiBackend(setting("GOOGLE_API_KEY"))
+    if provider == "openai":
+        return OpenAICompatibleBackend(setting("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+                                       setting("OPENAI_API_KEY"))
+    if provider == "fake":
+        return FakeBackend()
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+    return _backend
+
+
+def set_backend(backend):
+    global _backend
+    with _backend_lock:
+        _backend = backend
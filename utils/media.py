@@ -0,0 +1,110 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+
+from PIL import Image
+
+
+# Pictures are stored at the size they are shown at: the placeholder's size
+# at this many pixels per inch (150 is plenty for projectors and screens).
+IMAGE_DPI = int(os.environ.get("PPTX_IMAGE_DPI", 150))
+JPEG_QUALITY = 85
+PNG_MAX_COLORS = 256  # fewer distinct colours than this -> flat artwork, kept as PNG
+EMU_PER_INCH = 914400
+
+logger = logging.getLogger(__name__)
+
+
+def target_pixels(box, dpi):
+    _, _, width, height = box
+    return max(1, round(width / EMU_PER_INCH * dpi)), max(1, round(height / EMU_PER_INCH * dpi))
+
+
+def has_alpha(image):
+    if image.mode in ("RGBA", "LA"):
+        return image.getextrema()[-1][0] < 255
+    return image.mode == "P" and "transparency" in image.info
+
+
+def choose_format(image):
+    # Photos (diffusion output) compress far better as JPEG; transparent or
+    # flat-colour images stay PNG so edges don't smear.
+    if has_alpha(image):
+        return "PNG"
+    sample = image.copy()
+    sample.thumbnail((128, 128))
+    return "PNG" if sample.convert("RGB").getcolors(PNG_MAX_COLORS) is not None else "JPEG"
+
+
+def encode(image, image_format, quality=JPEG_QUALITY):
+    buffer = io.BytesIO()
+    if image_format == "JPEG":
+        image.convert("RGB").save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+# Post-processing for one deck's generated pictures (ImagePipeline
+# postprocess hook): downscales each image to its placeholder at `dpi`,
+# re-encodes it as JPEG or optimized PNG and reuses the result for repeated
+# images, so python-pptx (which stores identical blobs once) embeds a
+# single media part for them. Runs on the image worker threads.
+class MediaOptimizer:
+
+    def __init__(self, box, dpi=IMAGE_DPI, quality=JPEG_QUALITY):
+        self.size = target_pixels(box, dpi) if box else None
+        self.quality = quality
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.images = 0
+        self.duplicates = 0
+        self.seconds = 0.0
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, path):
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            if digest in self._seen:
+                self.duplicates += 1
+                return self._seen[digest]
+
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            if self.size and (image.width > self.size[0] or image.height > self.size[1]):
+                # Same stretch-to-box the picture gets on the slide anyway.
+                image = image.resize(self.size, Image.LANCZOS)
+            image_format = choose_format(image)
+            optimized = encode(image, image_format, self.quality)
+
+        if len(optimized) < len(data):
+            path = os.path.splitext(path)[0] + (".jpg" if image_format == "JPEG" else ".png")
+            with open(path, "wb") as f:
+                f.write(optimized)
+        else:
+            optimized = data
+
+        with self._lock:
+            self._seen[digest] = path
+            self.images += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(optimized)
+            self.seconds += time.perf_counter() - start
+        return path
+
+    def report(self):
+        with self._lock:
+            return {
+                "images": self.images,
+                "duplicate_images": self.duplicates,
+                "image_bytes_in": self.bytes_in,
+                "image_bytes_out": self.bytes_out,
+                "image_bytes_saved": self.bytes_in - self.bytes_out,
+            }
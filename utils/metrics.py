@@ -0,0 +1,174 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_sinks = []
+_sinks_lock = threading.Lock()
+
+
+# Prometheus-style in-process registry: a duration histogram per stage plus
+# free-form counters (prompt sizes, token counts, cache hits...) and gauges
+# (last value seen, e.g. queue depth).
+class MetricsRegistry:
+
+    BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, float("inf"))
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def __call__(self, record):
+        with self._lock:
+            key = (record["stage"], record["status"])
+            hist = self.histograms.setdefault(key, {"count": 0, "sum": 0.0, "buckets": [0] * len(self.BUCKETS)})
+            hist["count"] += 1
+            hist["sum"] += record["duration"]
+            for i, bound in enumerate(self.BUCKETS):
+                if record["duration"] <= bound:
+                    hist["buckets"][i] += 1
+            for name, value in record.get("counters", {}).items():
+                self.counters[(record["stage"], name)] = self.counters.get((record["stage"], name), 0) + value
+            for name, value in record.get("gauges", {}).items():
+                self.gauges[(record["stage"], name)] = value
+
+    def summary(self):
+        with self._lock:
+            return {
+                f"{stage}[{status}]": {"count": h["count"], "total": h["sum"], "mean": h["sum"] / h["count"]}
+                for (stage, status), h in sorted(self.histograms.items())
+            }
+
+    def render(self):
+        lines = ["# TYPE pptx_stage_seconds histogram"]
+        with self._lock:
+            for (stage, status), hist in sorted(self.histograms.items()):
+                labels = f'stage="{stage}",status="{status}"'
+                for bound, count in zip(self.BUCKETS, hist["buckets"]):
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'pptx_stage_seconds_bucket{{{labels},le="{le}"}} {count}')
+                lines.append(f"pptx_stage_seconds_sum{{{labels}}} {hist['sum']}")
+                lines.append(f"pptx_stage_seconds_count{{{labels}}} {hist['count']}")
+            lines.append("# TYPE pptx_stage_total counter")
+            for (stage, name), value in sorted(self.counters.items()):
+                lines.append(f'pptx_stage_total{{stage="{stage}",name="{name}"}} {value}')
+            lines.append("# TYPE pptx_stage_gauge gauge")
+            for (stage, name), value in sorted(self.gauges.items()):
+                lines.append(f'pptx_stage_gauge{{stage="{stage}",name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+
+# Appends one JSON object per finished span to a file.
+class JsonLinesSink:
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+registry = MetricsRegistry()
+
+
+def add_sink(sink):
+    with _sinks_lock:
+        _sinks.append(sink)
+
+
+def remove_sink(sink):
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def emit(record):
+    with _sinks_lock:
+        sinks = list(_sinks)
+    for sink in sinks:
+        try:
+            sink(record)
+        except Exception:
+            logger.exception("Metrics sink failed")
+
+
+@contextmanager
+def trace(trace_id=None):
+    # Groups every span recorded in this context (one deck, one request).
+    token = _trace_id.set(trace_id or uuid.uuid4().hex)
+    try:
+        yield _trace_id.get()
+    finally:
+        _trace_id.reset(token)
+
+
+@contextmanager
+def span(stage, **attributes):
+    # Times a pipeline stage. The yielded record's "attributes" and
+    # "counters" can be filled in while the stage runs; counters are also
+    # summed per stage in the registry.
+    record = {"stage": stage, "trace": _trace_id.get(), "attributes": attributes, "counters": {}}
+    start = time.perf_counter()
+    record["start"] = time.time()
+    try:
+        yield record
+        record["status"] = "ok"
+    except BaseException as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["duration"] = time.perf_counter() - start
+        logger.debug("%s took %.3fs (%s)", stage, record["duration"], record["status"])
+        emit(record)
+
+
+def record_duration(stage, duration, **counters):
+    # For stages whose time is spread out (e.g. parsing interleaved with a
+    # stream) and measured by the caller rather than a single with-block.
+    emit({
+        "stage": stage, "trace": _trace_id.get(), "attributes": {}, "counters": counters,
+        "start": time.time() - duration, "duration": duration, "status": "ok",
+    })
+
+
+def traced(stage):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    # Thread pools don't inherit context variables; carry the trace along.
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args, **kwargs)
+
+
+add_sink(registry)
+if os.environ.get("PPTX_TRACE_FILE"):
+    add_sink(JsonLinesSink(os.environ["PPTX_TRACE_FILE"]))
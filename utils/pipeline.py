@@ -0,0 +1,60 @@
+from utils.artifacts import put_artifact
+from utils.deck import edit_slide, load_deck, new_deck, regenerate_slide, render_deck, save_deck
+from utils.extract import read_upload
+from utils.prompt import slide_repairer, stream_presentation
+from utils.slide import generate_pptx, iter_slides
+
+
+def build_presentation(data, filename, slide_count=6, include_visuals=False, report=None):
+    # Full upload -> deck pipeline. report(stage, progress) is called as the
+    # work advances; progress is a 0..1 fraction of the whole job. Returns
+    # (deck_id, artifact_id): the deck model is saved so single slides can be
+    # reworked later with update_slide, and the PPTX goes to the artifact
+    # store (utils.artifacts).
+    report = report or (lambda stage, progress: None)
+
+    report("read", 0.0)
+    doc_text = read_upload(data, filename)
+
+    report("generate", 0.1)
+    chunks = stream_presentation(doc_text, slide_count, include_visuals=include_visuals)
+    slides = []
+
+    def tracked(parsed):
+        for index, slide in enumerate(parsed):
+            report("generate", 0.1 + 0.7 * min(index + 1, slide_count) / slide_count)
+            slides.append(slide)
+            yield slide
+        # The model is done; what's left is waiting for pictures and
+        # writing the PPTX.
+        report("render", 0.8)
+
+    # Slides are built (and image jobs started) as soon as each one arrives
+    # from the streaming model response; a malformed slide costs one small
+    # repair call rather than a new generation.
+    pptx_bytes = generate_pptx(tracked(iter_slides(chunks, repair=slide_repairer())), output=None)
+    deck_id = save_deck(new_deck(slides, doc_text, slide_count, include_visuals))
+    artifact_id = put_artifact(pptx_bytes)
+    report("done", 1.0)
+    return deck_id, artifact_id
+
+
+def update_slide(deck_id, index, instruction=None, slide=None, report=None):
+    # Regenerates one slide with a focused model call (or, with slide given,
+    # replaces it with the user's edit) and reassembles the deck. Other
+    # slides and their pictures come from the saved deck and image cache.
+    report = report or (lambda stage, progress: None)
+
+    deck = load_deck(deck_id)
+    report("generate", 0.1)
+    if slide is None:
+        # An explicit regenerate should get a fresh reply, not the cached one.
+        regenerate_slide(deck, index, instruction, use_cache=False)
+    else:
+        edit_slide(deck, index, slide)
+    save_deck(deck)
+
+    report("render", 0.6)
+    artifact_id = put_artifact(render_deck(deck))
+    report("done", 1.0)
+    return deck_id, artifact_id
@@ -1,13 +1,30 @@
+import json
+import logging
+import os
+import threading
+import time
 
-import google.generativeai as genai
-from google.generativeai.types import GenerationConfig
-from huggingface_hub import InferenceClient
-import streamlit as st
+from utils.cache import CACHE_DIR, DiskCache, SingleFlight, cache_key
+from utils.compact import compact_text
+from utils.llm import DEFAULT_MODEL, get_backend, setting
+from utils.metrics import span
+from utils.ratelimit import get_rate_limiter
+from utils.schema import has_valid_slide, repair_json
+from utils.summarize import condense_text, estimate_tokens
 
 
+logger = logging.getLogger(__name__)
 
-def build_prompt(text, slide_count=6, include_visuals=False):
+# Ask the model for an English image prompt next to the Azerbaijani
+# description, so image slides need no translation step at all.
+ENGLISH_IMAGE_PROMPTS = os.environ.get("ENGLISH_IMAGE_PROMPTS") == "1"
+
+
+
+def build_prompt(text, slide_count=6, include_visuals=False, english_image_prompts=None):
     remaining = slide_count - 3
+    if english_image_prompts is None:
+        english_image_prompts = ENGLISH_IMAGE_PROMPTS
 
     if include_visuals:
         main = remaining // 2
@@ -23,6 +40,16 @@ def build_prompt(text, slide_count=6, include_visuals=False):
     else:
         main = remaining
         note = ""
+
+    image_prompt_field = (
+        '\n        "description_en": "Əgər type \'image\'dirsə, şəkil generatoru üçün description-un ingilis dilində qısa, '
+        'konkret tərcüməsi. Digər hallarda boş saxlanılır.",'
+        if english_image_prompts else ""
+    )
+    image_prompt_rule = (
+        "\n    - `type` = \"image\" olduqda, `description_en` sahəsi də doldurulmalıdır (yalnız ingilis dilində)."
+        if english_image_prompts else ""
+    )
     return f"""
 Sənə bir sənədin mətni təqdim olunur. Bu mətni təhlil et və təqdimat üçün aşağıdakı struktura uyğun slayd formatında hazırla:
 
@@ -64,7 +91,7 @@ QAYDALAR:
     {{
         "type": "none" | "image" | "bar" | "pie" | "line",
         "title": "Vizualın başlığı",
-        "description": "Əgər type 'image'dirsə, burada şəkilin ətraflı təsviri verilir. Digər hallarda boş saxlanılır.",
+        "description": "Əgər type 'image'dirsə, burada şəkilin ətraflı təsviri verilir. Digər hallarda boş saxlanılır.",{image_prompt_field}
         "xlabel": "X oxunun etiketi (əgər tətbiq olunursa)",
         "ylabel": "Y oxunun etiketi (əgər tətbiq olunursa)",
         "x": ["X oxundakı dəyərlər (əgər varsa)"],
@@ -75,7 +102,7 @@ QAYDALAR:
     ```
 
     - `type` sahəsi yalnız aşağıdakı dəyərlərdən biri ola bilər: "none", "image", "bar", "pie", "line"
-    - `type` = "image" olduqda, `description` sahəsi vacibdir və şəkilin məzmununu izah etməlidir.
+    - `type` = "image" olduqda, `description` sahəsi vacibdir və şəkilin məzmununu izah etməlidir.{image_prompt_rule}
     - `type` = "bar" və ya "line" olduqda x, y, xlabel, ylabel sahələri dolu olmalıdır.
     -  Əgər uyğun vizual yoxdursa, `type` dəyəri `"none"` olmalıdır.
     - `type` = "pie" olduqda labels və sizes sahələri dolu olmalı, `x`, `y`, `xlabel`, `ylabel` isə boş buraxılmalıdır.
@@ -132,52 +159,265 @@ CAVABI BU FORMATA JSON ARRAY KİMİ QAYTAR:
 """
 
 
-def get_presentation(text, slide_count=6, model_name='gemini-1.5-flash', include_visuals=False):
-    genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
-    prompt = build_prompt(text, slide_count, include_visuals)
-    print(prompt)
-    model = genai.GenerativeModel(
-        model_name=model_name,
-        system_instruction="Sən təqdimat üzrə Azərbaycan dilində AI asistentsən."
-    )
+SYSTEM_INSTRUCTION = "Sən təqdimat üzrə Azərbaycan dilində AI asistentsən."
+GENERATION_CONFIG = {
+    "temperature": 0.3,  # Controls randomness. Lower values are more deterministic.
+}
+# Slide requests ask for JSON mode so the model cannot wrap the array in
+# prose or code fences. Backends ignore options they don't support.
+SLIDES_CONFIG = {**GENERATION_CONFIG, "response_mime_type": "application/json"}
+RESPONSE_CACHE_BYTES = 64 * 1024 * 1024
+RESPONSE_CACHE_TTL = 7 * 24 * 3600
 
-    generation_config = GenerationConfig(
-        temperature=0.3,  # Controls randomness. Lower values are more deterministic.
-    )
+_response_cache = None
+_response_cache_lock = threading.Lock()
+_inflight = SingleFlight()
+
+
+def get_response_cache():
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = DiskCache(os.path.join(CACHE_DIR, "responses"), max_bytes=RESPONSE_CACHE_BYTES,
+                                        suffix=".txt", ttl=RESPONSE_CACHE_TTL)
+    return _response_cache
+
+
+def is_error_response(response_text):
+    return response_text.startswith("Error:") or response_text == "Content generation failed."
 
-    try:
-        # Send the prompt to the Gemini model
-        response = model.generate_content(
-            contents=[
-                {"role": "user", "parts": [{"text": prompt}]}
-            ],
-            generation_config=generation_config
-        )
 
-        if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-            return response.candidates[0].content.parts[0].text
+def cached_response(cache, key, validate=None):
+    # The cached reply for key, or None. Entries that no longer pass
+    # validate are dropped.
+    cached = cache.get(key)
+    if cached is None:
+        return None
+    response_text = cached.decode("utf-8")
+    if validate is not None and not validate(response_text):
+        cache.delete(key)
+        return None
+    return response_text
+
+
+def cached_generate(prompt, model_name=DEFAULT_MODEL, use_cache=True, config=GENERATION_CONFIG, validate=None):
+    # validate(response_text) -> bool decides whether a reply may be cached;
+    # one the caller can't use would otherwise be served again on every
+    # retry until it expires.
+    if not use_cache:
+        return generate_content(prompt, model_name, config)
+
+    cache = get_response_cache()
+    key = cache_key(model_name, SYSTEM_INSTRUCTION, config, prompt)
+    cached = cached_response(cache, key, validate)
+    if cached is not None:
+        logger.info("Using cached model response.")
+        return cached
+
+    def generate():
+        # Another request may have filled the cache while we waited to lead.
+        cached = cached_response(cache, key, validate)
+        if cached is not None:
+            return cached
+        response_text = generate_content(prompt, model_name, config)
+        if is_error_response(response_text):
+            return response_text
+        if validate is None or validate(response_text):
+            cache.set(key, response_text.encode("utf-8"))
         else:
-            print("Error: Model did not return expected content structure.")
-            return "Content generation failed."
+            logger.warning("Model response failed validation; not caching it.")
+        return response_text
+
+    # Identical requests already in flight share that call instead of
+    # sending their own.
+    return _inflight.do(key, generate)
+
+
+def summarizer(model_name=DEFAULT_MODEL, use_cache=True):
+    def summarize(prompt):
+        response_text = cached_generate(prompt, model_name, use_cache)
+        if is_error_response(response_text):
+            raise ValueError(f"Summarization failed: {response_text}")
+        return response_text
+    return summarize
+
+
+def build_repair_prompt(broken):
+    items = "\n\n".join(
+        f"Slayd {i}:\n{raw}\nXətalar: {'; '.join(errors)}" for i, raw, errors in broken
+    )
+    return f"""
+Aşağıdakı slayd JSON obyektləri tələb olunan formata uyğun deyil. Yalnız bu slaydları düzəlt: göstərilən xətaları aradan qaldır, məzmunu mümkün qədər saxla və yeni məlumat əlavə etmə.
+
+TƏLƏB OLUNAN FORMAT:
+- type = "title": title
+- type = "intro": aim, summary
+- type = "main": title, point1, point2, point3, point4 (mətn) və visual (obyekt)
+- type = "recommendation": ən azı 4 sahə recommendation1 ... recommendation5
+- visual.type yalnız "none", "image", "bar", "pie", "line" ola bilər:
+  • "image" üçün description dolu olmalıdır
+  • "bar" və "line" üçün x və y eyni uzunluqda, boş olmayan siyahılardır
+  • "pie" üçün labels və sizes eyni uzunluqda, boş olmayan siyahılardır
+  • Uyğun məlumat yoxdursa, visual.type = "none" olmalıdır
+
+DÜZƏLDİLƏCƏK SLAYDLAR:
+{items}
+
+CAVABI {len(broken)} obyektdən ibarət JSON ARRAY KİMİ, EYNİ ARDICILLIQLA QAYTAR.
+"""
+
+
+def slide_repairer(model_name=DEFAULT_MODEL, use_cache=True):
+    # repair callable for utils.slide.parse_gpt_response / iter_slides: one
+    # small follow-up call for just the slides that failed validation,
+    # instead of regenerating the whole deck. Takes a list of
+    # (index, raw_json, errors) and returns {index: slide}.
+    def repair(broken):
+        with span("repair", slides=len(broken)):
+            response_text = cached_generate(build_repair_prompt(broken), model_name, use_cache, SLIDES_CONFIG,
+                                            validate=has_valid_slide)
+        if is_error_response(response_text):
+            logger.warning("Slide repair failed: %s", response_text)
+            return {}
+        try:
+            fixed = json.loads(repair_json(response_text))
+        except json.JSONDecodeError as e:
+            logger.warning("Slide repair returned invalid JSON: %s", e)
+            return {}
+        if isinstance(fixed, dict):
+            fixed = [fixed]
+        return {i: slide for (i, _, _), slide in zip(broken, fixed)}
+    return repair
+
+
+def get_presentation(text, slide_count=6, model_name=DEFAULT_MODEL, include_visuals=False, use_cache=True,
+                     summarize=None):
+    text = prepare_document(text, model_name, use_cache, summarize)
+    prompt = traced_build_prompt(text, slide_count, include_visuals)
+    return cached_generate(prompt, model_name, use_cache, SLIDES_CONFIG, validate=has_valid_slide)
+
+
+def prepare_document(text, model_name=DEFAULT_MODEL, use_cache=True, summarize=None):
+    # Strips boilerplate and duplicates, then map-reduces documents that are
+    # still too large. summarize: callable(prompt) -> text used for the chunk
+    # summaries; defaults to the same model.
+    text, _ = compact_text(text)
+    return condense_text(text, summarize or summarizer(model_name, use_cache))
+
+
+def traced_build_prompt(text, slide_count, include_visuals):
+    with span("prompt_build", slide_count=slide_count) as record:
+        prompt = build_prompt(text, slide_count, include_visuals)
+        record["counters"]["document_chars"] = len(text)
+        record["counters"]["prompt_chars"] = len(prompt)
+        record["counters"]["prompt_tokens"] = estimate_tokens(prompt)
+    return prompt
+
+
+def record_usage(record, prompt, response_text, usage=None):
+    # Prefer the token counts reported by the model over our estimate.
+    usage = usage or {}
+    counters = record["counters"]
+    counters["prompt_chars"] = len(prompt)
+    counters["response_chars"] = len(response_text)
+    counters["prompt_tokens"] = usage.get("prompt_tokens") or estimate_tokens(prompt)
+    counters["response_tokens"] = usage.get("response_tokens") or estimate_tokens(response_text)
+
+
+def generate_content(prompt, model_name=DEFAULT_MODEL, config=GENERATION_CONFIG):
+    logger.debug("Sending prompt of %d characters to %s.", len(prompt), model_name)
+    try:
+        with span("llm_call", model=model_name) as record:
+            response_text, usage = get_backend().generate(prompt, model_name, SYSTEM_INSTRUCTION, config)
+            record_usage(record, prompt, response_text, usage)
+            return response_text
 
     except Exception as e:
-        print(f"An error occurred during content generation: {e}")
+        logger.error("An error occurred during content generation: %s", e)
         return f"Error: {e}"
 
 
-def generate_image_hf(prompt, output_path):
-    client = InferenceClient(
-        provider="hf-inference",
-        api_key=st.secrets["HF_API_KEY"]
+def stream_content(prompt, model_name=DEFAULT_MODEL, config=SLIDES_CONFIG):
+    with span("llm_stream", model=model_name) as record:
+        start = time.perf_counter()
+        parts = []
+        for text in get_backend().stream(prompt, model_name, SYSTEM_INSTRUCTION, config):
+            if not parts:
+                record["attributes"]["first_chunk_seconds"] = time.perf_counter() - start
+            parts.append(text)
+            yield text
+        record_usage(record, prompt, "".join(parts))
+
+
+def stream_presentation(text, slide_count=6, model_name=DEFAULT_MODEL, include_visuals=False,
+                        use_cache=True, stream=stream_content, summarize=None):
+    # Yields the model response in chunks as they arrive (feed these to
+    # utils.slide.iter_slides). A cached response is yielded in one piece.
+    text = prepare_document(text, model_name, use_cache, summarize)
+    prompt = traced_build_prompt(text, slide_count, include_visuals)
+    if not use_cache:
+        yield from stream(prompt, model_name)
+        return
+
+    cache = get_response_cache()
+    key = cache_key(model_name, SYSTEM_INSTRUCTION, SLIDES_CONFIG, prompt)
+    # Same key as get_presentation: an identical deck already being
+    # generated (streamed or not) is waited for and then read from the cache
+    # instead of being requested a second time.
+    with _inflight.hold(key):
+        cached = cached_response(cache, key, has_valid_slide)
+        if cached is not None:
+            logger.info("Using cached model response.")
+            yield cached
+            return
+
+        chunks = []
+        for chunk in stream(prompt, model_name):
+            chunks.append(chunk)
+            yield chunk
+
+        # Only a stream that ran to the end and holds at least one valid
+        # slide is kept; a consumer that stops early never gets here.
+        response_text = "".join(chunks)
+        if has_valid_slide(response_text):
+            cache.set(key, response_text.encode("utf-8"))
+        else:
+            logger.warning("Streamed response failed validation; not caching it.")
+
+
+IMAGE_MODEL = "stabilityai/stable-diffusion-3-medium-diffusers"
+IMAGE_SIZE = (1024, 1024)
+IMAGE_TIMEOUT = 180  # seconds for one image: the HF request, a free inference slot, the whole job
+
+
+_image_client = None
+_image_client_lock = threading.Lock()
+
+
+def get_image_client():
+    # huggingface_hub is slow to import; it is loaded with the first image
+    # request and the client is shared by every later one.
+    global _image_client
+    with _image_client_lock:
+        if _image_client is None:
+            from huggingface_hub import InferenceClient
+
+            _image_client = InferenceClient(provider="hf-inference", api_key=setting("HF_API_KEY"),
+                                            timeout=IMAGE_TIMEOUT)
+    return _image_client
 
-    )
 
+def generate_image_hf(prompt, output_path, model=IMAGE_MODEL, size=IMAGE_SIZE):
+    get_rate_limiter().acquire("hf", model)
+    width, height = size
     # This returns a PIL.Image object
-    image = client.text_to_image(
+    image = get_image_client().text_to_image(
         prompt,
-        model="stabilityai/stable-diffusion-3-medium-diffusers",
+        model=model,
+        width=width,
+        height=height,
     )
 
     # Save PIL image to file
     image.save(output_path)
-    return output_path
\ No newline at end of file
+    return output_path
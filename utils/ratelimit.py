@@ -0,0 +1,206 @@
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from utils.cache import CACHE_DIR
+from utils.metrics import span
+
+
+# Requests and tokens per minute allowed per model, keyed "provider:model"
+# or just "provider" (applies to each of its models). Providers without an
+# entry are not limited. PPTX_RATE_LIMITS (JSON, same shape) overrides.
+DEFAULT_LIMITS = {
+    "gemini": {"rpm": 1000, "tpm": 4_000_000},
+    "openai": {"rpm": 500, "tpm": 200_000},
+    "hf": {"rpm": 60},
+}
+RATE_LIMIT_DB = os.path.join(CACHE_DIR, "ratelimit.sqlite3")
+POLL_SECONDS = 0.05
+STALE_SECONDS = 10.0  # waiters not seen for this long belong to a dead process
+
+# Lower runs first. Interactive (single deck) work goes ahead of batch runs.
+INTERACTIVE = 0
+BATCH = 10
+
+logger = logging.getLogger(__name__)
+
+_priority = contextvars.ContextVar("rate_limit_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level):
+    # Model calls made in this context (and in pools started with
+    # submit_in_context) queue at this priority.
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def load_limits():
+    limits = dict(DEFAULT_LIMITS)
+    if os.environ.get("PPTX_RATE_LIMITS"):
+        limits.update(json.loads(os.environ["PPTX_RATE_LIMITS"]))
+    return limits
+
+
+class Reservation:
+
+    def __init__(self, limiter, key, limits, tokens):
+        self.limiter = limiter
+        self.key = key
+        self.limits = limits
+        self.tokens = tokens
+
+    def settle(self, actual_tokens):
+        # Corrects the token bucket once the real usage is known.
+        if self.limits and self.limits.get("tpm") and actual_tokens is not None:
+            self.limiter.adjust(self.key, self.limits, self.tokens - actual_tokens)
+
+
+# Token buckets shared by every process on the machine through one SQLite
+# file: each model has a requests bucket and a tokens bucket refilled
+# continuously at rpm/60 and tpm/60 per second. Callers wait in a queue
+# table ordered by (priority, arrival), so only the head of the queue may
+# take from the buckets.
+class RateLimiter:
+
+    def __init__(self, path=RATE_LIMIT_DB, limits=None, poll=POLL_SECONDS):
+        self.path = path
+        self.limits = load_limits() if limits is None else limits
+        self.poll = poll
+        self._local = threading.local()
+        self._setup_lock = threading.Lock()
+        self._ready = False
+
+    def limits_for(self, provider, model):
+        return self.limits.get(f"{provider}:{model}") or self.limits.get(provider)
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            with self._setup_lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL, updated REAL)")
+                    conn.execute("CREATE TABLE IF NOT EXISTS waiters (id TEXT PRIMARY KEY, key TEXT, "
+                                 "priority INTEGER, enqueued REAL, seen REAL)")
+                    self._ready = True
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, provider, model, tokens=0, level=None):
+        # Blocks until one request and `tokens` tokens are available for
+        # this model; returns a Reservation to settle with the real usage.
+        key = f"{provider}:{model}"
+        limits = self.limits_for(provider, model)
+        if not limits:
+            return Reservation(self, key, None, tokens)
+
+        level = _priority.get() if level is None else level
+        conn = self.connection()
+        waiter = uuid.uuid4().hex
+        now = time.time()
+        conn.execute("INSERT INTO waiters VALUES (?, ?, ?, ?, ?)", (waiter, key, level, now, now))
+
+        with span("rate_limit", provider=provider, model=model, priority=level) as record:
+            start = time.perf_counter()
+            record["gauges"] = {"queue_depth": self.queue_depth(key)}
+            try:
+                while True:
+                    wait = self._try_take(conn, waiter, key, limits, tokens)
+                    if wait == 0:
+                        break
+                    time.sleep(min(wait, 1.0))
+            finally:
+                conn.execute("DELETE FROM waiters WHERE id = ?", (waiter,))
+            waited = time.perf_counter() - start
+            record["counters"]["wait_seconds"] = waited
+            record["counters"]["reserved_tokens"] = tokens
+        if waited > 1:
+            logger.info("Waited %.1fs for %s rate limit.", waited, key)
+        return Reservation(self, key, limits, tokens)
+
+    def _try_take(self, conn, waiter, key, limits, tokens):
+        # One transaction: heartbeat, check we're at the head of the queue,
+        # refill and take. Returns 0 once taken, else seconds to wait.
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("UPDATE waiters SET seen = ? WHERE id = ?", (now, waiter))
+            conn.execute("DELETE FROM waiters WHERE seen < ?", (now - STALE_SECONDS,))
+            head = conn.execute("SELECT id FROM waiters WHERE key = ? ORDER BY priority, enqueued LIMIT 1",
+                                (key,)).fetchone()
+            if head is None or head[0] != waiter:
+                conn.execute("COMMIT")
+                return self.poll
+
+            wanted = []
+            for kind, amount in (("rpm", 1), ("tpm", tokens)):
+                rate = limits.get(kind)
+                if not rate or amount <= 0:
+                    continue
+                name = f"{key}:{kind}"
+                row = conn.execute("SELECT level, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+                level = rate if row is None else min(rate, row[0] + (now - row[1]) * rate / 60)
+                # A single call bigger than a whole minute's quota waits for a full bucket.
+                wanted.append((name, level, min(amount, rate), rate))
+
+            wait = max([(amount - level) * 60 / rate for _, level, amount, rate in wanted if level < amount],
+                       default=0)
+            if wait == 0:
+                for name, level, amount, _ in wanted:
+                    conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (name, level - amount, now))
+            conn.execute("COMMIT")
+            return max(wait, 0.001) if wait else 0
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def adjust(self, key, limits, delta):
+        # Gives back (or, with a negative delta, takes) tokens after the fact.
+        conn = self.connection()
+        name = f"{key}:tpm"
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT level, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE buckets SET level = ? WHERE name = ?",
+                             (min(limits["tpm"], row[0] + delta), name))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def queue_depth(self, key=None):
+        conn = self.connection()
+        if key is None:
+            return conn.execute("SELECT COUNT(*) FROM waiters").fetchone()[0]
+        return conn.execute("SELECT COUNT(*) FROM waiters WHERE key = ?", (key,)).fetchone()[0]
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+    return _limiter
+
+
+def set_rate_limiter(limiter):
+    global _limiter
+    with _limiter_lock:
+        _limiter = limiter
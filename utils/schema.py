@@ -0,0 +1,173 @@
+import json
+import re
+
+
+SLIDE_TYPES = ("title", "intro", "main", "recommendation")
+VISUAL_TYPES = ("none", "image", "bar", "pie", "line")
+
+# Declarative description of the slide objects the model must return. It is
+# compiled once into plain check functions (see compile_schema) so
+# validating a slide is a handful of dict lookups.
+SLIDE_SCHEMA = {
+    "title": {"required": {"title": str}},
+    "intro": {"required": {"aim": str, "summary": str}},
+    "main": {
+        "required": {"title": str, "point1": str, "point2": str, "point3": str, "point4": str, "visual": dict},
+    },
+    "recommendation": {
+        "at_least": (4, [f"recommendation{n}" for n in range(1, 6)]),
+    },
+}
+
+VISUAL_SCHEMA = {
+    "bar": {"lists": ("x", "y")},
+    "line": {"lists": ("x", "y")},
+    "pie": {"lists": ("labels", "sizes")},
+    "image": {"required": ("description",)},
+}
+
+
+def compile_visual_checks(schema):
+    def check(visual):
+        errors = []
+        visual_type = visual.get("type")
+        if visual_type not in VISUAL_TYPES:
+            return [f"'visual.type' must be one of {list(VISUAL_TYPES)}, got {visual_type!r}"]
+        rules = schema.get(visual_type, {})
+        for field in rules.get("required", ()):
+            if not visual.get(field):
+                errors.append(f"'visual.{field}' is required for {visual_type} visuals")
+        lists = rules.get("lists")
+        if lists:
+            values = [visual.get(field) for field in lists]
+            if not all(isinstance(value, list) and value for value in values):
+                errors.append(f"'visual.{lists[0]}' and 'visual.{lists[1]}' must be non-empty lists")
+            elif len(values[0]) != len(values[1]):
+                errors.append(f"'visual.{lists[0]}' and 'visual.{lists[1]}' must have the same length")
+        return errors
+    return check
+
+
+def compile_schema(schema, visual_schema):
+    check_visual = compile_visual_checks(visual_schema)
+    compiled = {}
+    for slide_type, rules in schema.items():
+        checks = []
+        required = rules.get("required", {})
+        if required:
+            def check_required(slide, slide_type=slide_type, required=required):
+                missing = {field for field in required if field not in slide}
+                if missing:
+                    return [f"type '{slide_type}' missing fields: {missing}"]
+                return [
+                    f"'{field}' must be {kind.__name__ if kind is not dict else 'an object'}"
+                    for field, kind in required.items() if not isinstance(slide[field], kind)
+                ]
+            checks.append(check_required)
+        if "at_least" in rules:
+            count, fields = rules["at_least"]
+
+            def check_at_least(slide, slide_type=slide_type, count=count, fields=fields):
+                if sum(1 for field in fields if slide.get(field)) < count:
+                    return [f"type '{slide_type}' requires at least {count} of {fields}"]
+                return []
+            checks.append(check_at_least)
+        if "visual" in required:
+            checks.append(lambda slide: check_visual(slide["visual"]) if isinstance(slide.get("visual"), dict) else [])
+        compiled[slide_type] = checks
+    return compiled
+
+
+COMPILED_SCHEMA = compile_schema(SLIDE_SCHEMA, VISUAL_SCHEMA)
+
+
+def slide_errors(slide):
+    if not isinstance(slide, dict):
+        return ["is not a JSON object"]
+    slide_type = slide.get("type")
+    if slide_type not in COMPILED_SCHEMA:
+        return [f"has unknown type: {slide_type}"]
+    errors = []
+    for check in COMPILED_SCHEMA[slide_type]:
+        errors.extend(check(slide))
+    return errors
+
+
+def only_visual_errors(errors):
+    return bool(errors) and all(error.startswith("'visual.") for error in errors)
+
+
+def repair_json(text):
+    # Best-effort fix-ups for almost-valid model output: code fences and
+    # leading prose, trailing commas, and output cut off mid-array (open
+    # strings and brackets are closed, a dangling key or comma is dropped).
+    text = re.sub(r'\s*`+\s*$', '', text.strip())  # closing fence, possibly cut short
+    starts = [pos for pos in (text.find('['), text.find('{')) if pos != -1]
+    text = text[min(starts):] if starts else text
+
+    out = []
+    stack = []
+    in_string = False
+    escape = False
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]':
+            # Drop a trailing comma before the closing bracket.
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ',':
+                out.pop()
+            if stack:
+                stack.pop()
+        out.append(ch)
+
+    if in_string:
+        if escape:
+            out.pop()  # a lone backslash would escape the closing quote
+        out.append('"')
+    repaired = ''.join(out).rstrip()
+    # A value cut off mid-literal: "12." -> "12"; "tr", "nul" or "-" go.
+    repaired = re.sub(r'(?<=\d)[.eE+-]+$', '', repaired)
+    repaired = re.sub(r'([\[:,]\s*)(?:-|t|tr|tru|f|fa|fal|fals|n|nu|nul)$', r'\1', repaired)
+    if stack and stack[-1] == '}':
+        # A key without its value.
+        repaired = re.sub(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*:?\s*$',
+                          lambda match: '{' if match.group(1) == '{' else '', repaired)
+    repaired = re.sub(r'[,:]\s*$', '', repaired)
+    while stack:
+        repaired += stack.pop()
+    return repaired
+
+
+def decode_json(text):
+    # Strict parse first, then the tolerant repair; None when neither works.
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(repair_json(text))
+    except json.JSONDecodeError:
+        return None
+
+
+def has_valid_slide(text):
+    # Guard for caching slide replies (a whole deck, a repair or a single
+    # slide): prose, an error page or JSON without one usable slide is never
+    # stored, so a retry asks the model again.
+    value = decode_json(text)
+    slides = value if isinstance(value, list) else [value]
+    return any(not slide_errors(slide) for slide in slides)
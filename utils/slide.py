@@ -1,19 +1,28 @@
-import re
+import io
+import logging
 import json
-from pptx import Presentation
+import tempfile
+import time
 from pptx.util import Inches, Pt
 from pptx.dml.color import RGBColor
-from googletrans import Translator
 from datetime import date
 
 
 from utils.chart import add_chart
-from utils.prompt import generate_image_hf
+from utils.metrics import record_duration, span, traced
+from utils.schema import only_visual_errors, repair_json, slide_errors
+from utils.template import get_template
+from utils.image import IMAGE_TIMEOUT, IMAGE_WORKERS, ImagePipeline, image_job_for, image_path_for
+from utils.media import IMAGE_DPI, MediaOptimizer
 
 
 
 
 
+logger = logging.getLogger(__name__)
+
+
+@traced("slide_title")
 def add_title_slide(prs, slide):
     today = date.today()
     formatted_date = today.strftime("%d/%m/%Y")
@@ -38,6 +47,7 @@ def add_title_slide(prs, slide):
             break
 
 
+@traced("slide_intro")
 def add_intro_slide(prs, slide):
     s = prs.slides[1]  # Target the second slide
     vertical_margin = Inches(0.2)
@@ -71,7 +81,7 @@ def add_intro_slide(prs, slide):
                     run_content.font.bold = False
 
                 else:
-                    print("Summary data is missing or empty.")
+                    logger.warning("Summary data is missing or empty.")
 
             elif text == "Məqsəd":
 
@@ -101,26 +111,15 @@ def add_intro_slide(prs, slide):
 
 
                 else:
-                    print("Aim data is missing or empty.")
+                    logger.warning("Aim data is missing or empty.")
         else:
-            print("    Does not have a text frame.")
+            logger.debug("Shape does not have a text frame.")
 
 
-def convert_sizes(sizes):
-    result = []
-    for s in sizes:
-        s = s.strip()
-        if s.endswith('%'):
-
-            value = float(s[:-1])
-        else:
-            value = float(s)
-        result.append(value)
-    return result
-
-
-def add_main_slide(prs, slide):
-    layout = prs.slide_layouts[12]
+@traced("slide_main")
+def add_main_slide(prs, slide, image_job=None, template=None):
+    template = template or get_template()
+    layout = template.main_layout(prs)
     s = prs.slides.add_slide(layout)
 
     s.shapes.title.text = slide['title']
@@ -143,59 +142,70 @@ def add_main_slide(prs, slide):
 
                     p.font.size = Pt(17)
 
-                    print(f"Populated shape with 'xxxx' (Point {current_point_idx}): '{point}'")
+                    logger.debug("Populated shape with point %d: %r", current_point_idx, point)
                 else:
                     shape.text_frame.clear()
-                    print(f"No content for point{current_point_idx}, cleared 'xxxx' from shape.")
+                    logger.debug("No content for point%d, cleared shape.", current_point_idx)
 
                 current_point_idx += 1
 
     visual = slide.get('visual', {})
     if visual.get('type') and visual['type'] != 'none':
 
-        visual_slide_layout = prs.slide_layouts[3]
+        visual_slide_layout = template.visual_layout(prs)
         visual_s = prs.slides.add_slide(visual_slide_layout)
         visual_s.shapes.title.text = f"{slide['title']} - {visual.get('title', 'Visual')}"
 
         if visual["type"] in ["bar", "line"]:
-            add_chart(visual_s, visual["type"], visual["title"],
-                      visual["x"], list(map(float, visual["y"])),
-                      visual.get("xlabel", ""), visual.get("ylabel", ""))
+            chart = add_chart(visual_s, visual["type"], visual.get("title", ""),
+                              visual["x"], visual["y"],
+                              visual.get("xlabel", ""), visual.get("ylabel", ""), box=template.visual_box)
+            if chart is None:
+                insert_text_or_fallback(visual_s, f"[Qrafik üçün məlumat yoxdur: {visual.get('title', '')}]")
 
         elif visual["type"] == "pie":
-            sizes = convert_sizes(visual["sizes"])
-            add_chart(visual_s, visual["type"], visual["title"],
-                      labels=visual['labels'], sizes=sizes)
+            chart = add_chart(visual_s, visual["type"], visual.get("title", ""),
+                              labels=visual['labels'], sizes=visual['sizes'], box=template.visual_box)
+            if chart is None:
+                insert_text_or_fallback(visual_s, f"[Qrafik üçün məlumat yoxdur: {visual.get('title', '')}]")
 
 
         elif visual["type"] == "image":
-            try:
-                image_path = f"generated_image_{visual['title'][:10].replace(' ', '_')}.png"
-                translator = Translator()
-                translated = translator.translate(visual["description"], src='az', dest='en')
-                english_description = translated.text
-                print(english_description)
-                generate_image_hf(english_description, image_path)
-
-                try:
-                    placeholder = visual_s.placeholders[1]
-                    left = placeholder.left
-                    top = placeholder.top
-                    width = placeholder.width
-                    height = placeholder.height
-
-                    # Add the picture at placeholder's position and size
-                    visual_s.shapes.add_picture(image_path, left, top, width=width, height=height)
-                except IndexError:
-                    print("Slide does not have a second placeholder.")
-                    insert_text_or_fallback(visual_s, f"[Şəkil təsviri: {visual['description']}]")
-
-            except Exception as e:
-                print(f"Error generating image: {e}")
-                insert_text_or_fallback(visual_s, f"[Şəkil təsviri: {visual['description']}]")
+            if image_job is None:
+                # Called outside generate_pptx: run the job inline.
+                with ImagePipeline(max_workers=1, postprocess=MediaOptimizer(template.visual_box)) as images:
+                    image_path = images.result(images.submit({
+                        "description": visual["description"],
+                        "output_path": image_path_for(0, visual, tempfile.gettempdir()),
+                    }))
+                add_image(visual_s, visual, image_path, template.visual_box)
+            # Otherwise the caller attaches the picture once image_job finishes.
         else:
             insert_text_or_fallback(visual_s, f"[Vizual növü '{visual['type']}' hələ dəstəklənmir]")
 
+        return visual_s
+
+
+def add_image(visual_s, visual, image_path, box=None):
+    if image_path is None:
+        insert_text_or_fallback(visual_s, f"[Şəkil təsviri: {visual['description']}]")
+        return
+
+    try:
+        if box is None:
+            placeholder = visual_s.placeholders[1]
+            box = (placeholder.left, placeholder.top, placeholder.width, placeholder.height)
+        left, top, width, height = box
+
+        # Add the picture at placeholder's position and size
+        visual_s.shapes.add_picture(image_path, left, top, width=width, height=height)
+    except IndexError:
+        logger.warning("Slide does not have a second placeholder.")
+        insert_text_or_fallback(visual_s, f"[Şəkil təsviri: {visual['description']}]")
+    except Exception as e:
+        logger.error("Error adding image: %s", e)
+        insert_text_or_fallback(visual_s, f"[Şəkil təsviri: {visual['description']}]")
+
 
 def insert_text_or_fallback(slide, text):
     try:
@@ -206,8 +216,10 @@ def insert_text_or_fallback(slide, text):
         textbox.text_frame.text = text
 
 
-def add_recommendation_slide(prs, slide):
-    layout = prs.slide_layouts[3]
+@traced("slide_recommendation")
+def add_recommendation_slide(prs, slide, template=None):
+    template = template or get_template()
+    layout = template.visual_layout(prs)
     s = prs.slides.add_slide(layout)
     title_shape = s.shapes.title
 
@@ -243,81 +255,242 @@ def add_recommendation_slide(prs, slide):
                 p.font.color.rgb = RGBColor(0, 0, 0)
                 p.font.size = Pt(21)
 
-                print(f"Added recommendation{i}: {rec}")
+                logger.debug("Added recommendation%d: %r", i, rec)
             else:
-                print(f"No data for recommendation{i}.")
-
-
-def delete_slide(prs, slide_index):
-    slide_id = prs.slides._sldIdLst[slide_index]
-    prs.slides._sldIdLst.remove(slide_id)
-
-
-def generate_pptx(slides, output_filename="presentation.pptx"):
-    prs = Presentation("format_new.pptx")
-
-    for slide in slides:
-        t = slide.get('type')
-        if t == 'title':
-            add_title_slide(prs, slide)
-        elif t == 'intro':
-            add_intro_slide(prs, slide)
-        elif t == 'main':
-            add_main_slide(prs, slide)
-        elif t == 'recommendation':
-            add_recommendation_slide(prs, slide)
-
-    delete_slide(prs, 3)
-    delete_slide(prs, 2)
-
-    prs.save(output_filename)
-    print(f"Presentation saved as '{output_filename}'")
-
-
-def parse_gpt_response(response_text):
+                logger.debug("No data for recommendation%d.", i)
+
+
+def generate_pptx(slides, output="presentation.pptx", image_backend=None, translate=None,
+                  max_workers=IMAGE_WORKERS, image_timeout=IMAGE_TIMEOUT, image_cache=None, template=None,
+                  image_dpi=IMAGE_DPI):
+    # The template is parsed once per process; each deck starts from a clone
+    # that already has the example slides removed.
+    template = template or get_template()
+    prs = template.clone()
+
+    # `slides` may be a list or a generator fed by a streaming model response.
+    # Each image job is started as soon as its slide arrives, so translation
+    # and image generation run concurrently with the rest of the deck; the
+    # pictures are attached once every slide has been built.
+    # Images are written to a private directory per deck so concurrent
+    # sessions never share (or overwrite) each other's files. Pictures are
+    # shrunk to their placeholder at image_dpi before embedding (None or 0
+    # embeds them as generated).
+    media = MediaOptimizer(template.visual_box, image_dpi) if image_dpi else None
+    with ImagePipeline(image_backend, translate, max_workers, image_timeout, cache=image_cache,
+                       postprocess=media) as images, \
+            tempfile.TemporaryDirectory(prefix="pptx-images-") as image_dir:
+        pending_images = []
+
+        # With the whole deck at hand, translate all image descriptions in
+        # one batch before the jobs start.
+        if isinstance(slides, (list, tuple)):
+            images.prefetch_translations(
+                [job for job in (image_job_for(i, slide, image_dir) for i, slide in enumerate(slides)) if job]
+            )
+
+        for index, slide in enumerate(slides):
+            t = slide.get('type')
+            if t == 'title':
+                add_title_slide(prs, slide)
+            elif t == 'intro':
+                add_intro_slide(prs, slide)
+            elif t == 'main':
+                job = image_job_for(index, slide, image_dir)
+                image_job = images.submit(job) if job else None
+                visual_s = add_main_slide(prs, slide, image_job, template)
+                if image_job is not None:
+                    pending_images.append((visual_s, slide['visual'], image_job))
+            elif t == 'recommendation':
+                add_recommendation_slide(prs, slide, template)
+
+        with span("image_wait", images=len(pending_images)):
+            for visual_s, visual, image_job in pending_images:
+                add_image(visual_s, visual, images.result(image_job), template.visual_box)
+
+        if images.cache is not None:
+            logger.info("Image cache: %s", images.cache.stats())
+
+    if media is not None and (media.images or media.duplicates):
+        report = media.report()
+        record_duration("image_optimize", media.seconds, **report)
+        logger.info("Images: %d embedded (%d repeated), %.1f MB -> %.1f MB, %.1f MB saved.",
+                    report["images"], report["duplicate_images"], report["image_bytes_in"] / 1e6,
+                    report["image_bytes_out"] / 1e6, report["image_bytes_saved"] / 1e6)
+
+    # output may be a filename or a writable binary stream; with None the
+    # deck is returned as bytes and nothing touches the disk.
+    with span("save") as record:
+        if output is None:
+            buffer = io.BytesIO()
+            prs.save(buffer)
+            record["counters"]["bytes"] = buffer.tell()
+            logger.info("Presentation built in memory (%d bytes).", buffer.tell())
+            return buffer.getvalue()
+
+        prs.save(output)
+        logger.info("Presentation saved as '%s'", output if isinstance(output, str) else "stream")
+
+
+def validate_slide(i, slide):
+    errors = slide_errors(slide)
+    if errors:
+        raise ValueError(f"Slide {i} {errors[0]}")
+
+
+def decode_slide(raw):
+    # Returns (slide, errors). Almost-valid JSON goes through the tolerant
+    # repair before it counts as broken.
     try:
+        slide = json.loads(raw)
+    except json.JSONDecodeError:
+        try:
+            slide = json.loads(repair_json(raw))
+        except json.JSONDecodeError as e:
+            return None, [f"is not valid JSON: {e}"]
+    return slide, slide_errors(slide)
+
+
+def resolve_slides(broken, repair=None):
+    # broken: list of (index, raw, slide, errors) for slides that failed
+    # validation. repair(list of (index, raw, errors)) -> {index: slide} asks
+    # the model again for just those slides. A slide whose only problem is
+    # its visual is kept with the visual dropped; anything else raises.
+    fixed = repair([(i, raw, errors) for i, raw, _, errors in broken]) if repair else {}
+    resolved = {}
+    for i, raw, slide, errors in broken:
+        for candidate in (fixed.get(i), slide):
+            if candidate is None:
+                continue
+            candidate_errors = slide_errors(candidate)
+            if not candidate_errors:
+                resolved[i] = candidate
+                break
+            if only_visual_errors(candidate_errors):
+                logger.warning("Slide %d: dropping invalid visual (%s).", i, "; ".join(candidate_errors))
+                resolved[i] = {**candidate, "visual": {"type": "none"}}
+                break
+        else:
+            raise ValueError(f"Slide {i} {errors[0]}")
+    return resolved
 
-        match = re.search(r'\[.*\]', response_text, re.DOTALL)
-        if match:
-            cleaned_text = match.group(0).strip()
-
-        slides = json.loads(cleaned_text)
 
+@traced("parse")
+def parse_gpt_response(response_text, repair=None):
+    start = response_text.find('[')
+    if start == -1:
+        raise ValueError("Expected a JSON array (list) of slides.")
 
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Invalid JSON format: {e}")
+    try:
+        slides = json.loads(response_text[start:response_text.rfind(']') + 1])
+    except json.JSONDecodeError:
+        try:
+            slides = json.loads(repair_json(response_text))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON format: {e}")
 
-    # Basic validation: check it's a list, and each slide has required fields depending on type
     if not isinstance(slides, list):
         raise ValueError("Expected a JSON array (list) of slides.")
 
+    broken = []
     for i, slide in enumerate(slides):
-        if not isinstance(slide, dict):
-            raise ValueError(f"Slide {i} is not a JSON object.")
-        slide_type = slide.get("type")
-        if slide_type not in {"title", "intro", "main", "recommendation"}:
-            raise ValueError(f"Slide {i} has unknown type: {slide_type}")
-
-        # Example minimal checks per slide type
-        if slide_type == "title":
-            if "title" not in slide:
-                raise ValueError(f"Slide {i} of type 'title' missing required fields.")
-        elif slide_type == "intro":
-            if "aim" not in slide or "summary" not in slide:
-                raise ValueError(f"Slide {i} of type 'intro' missing required fields.")
-        elif slide_type == "main":
-            required_fields = {"title", "point1", "point2", "point3", "point4", "visual"}
-            if not required_fields.issubset(slide.keys()):
-                missing = required_fields - set(slide.keys())
-                raise ValueError(f"Slide {i} of type 'main' missing fields: {missing}")
-            # Visual should be a dict
-            if not isinstance(slide["visual"], dict):
-                raise ValueError(f"Slide {i} 'visual' must be an object.")
-        elif slide_type == "recommendation":
-            # At least 4 recommendations required
-            rec_fields = [f"recommendation{i}" for i in range(1, 6)]
-            present_recs = [f for f in rec_fields if f in slide]
-            if len(present_recs) < 4:
-                raise ValueError(f"Slide {i} of type 'recommendation' requires at least 4 recommendations.")
-
-    return slides
\ No newline at end of file
+        errors = slide_errors(slide)
+        if errors:
+            broken.append((i, json.dumps(slide, ensure_ascii=False), slide, errors))
+    # All broken slides go back to the model in one follow-up call.
+    if broken:
+        for i, slide in resolve_slides(broken, repair).items():
+            slides[i] = slide
+
+    return slides
+
+
+# Incremental parser for a JSON array of slide objects arriving in chunks.
+# It tracks bracket depth and string/escape state character by character and
+# hands back the raw text of each top-level object as soon as its closing
+# brace is seen.
+class SlideStreamParser:
+
+    def __init__(self):
+        self.started = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.current = []
+        self.count = 0
+
+    def feed(self, chunk):
+        objects = []
+        for ch in chunk:
+            if self.done:
+                break
+            if not self.started:
+                if ch == '[':
+                    self.started = True
+                    self.depth = 1
+                continue
+
+            if self.depth >= 2:
+                self.current.append(ch)
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+
+            if ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.depth += 1
+                if self.depth == 2:
+                    self.current = [ch]
+            elif ch in '}]':
+                self.depth -= 1
+                if self.depth == 1 and ch == '}':
+                    objects.append(''.join(self.current))
+                    self.current = []
+                    self.count += 1
+                elif self.depth == 0:
+                    self.done = True
+        return objects
+
+    def pending(self):
+        # The unfinished object left when a response is cut off mid-slide.
+        return ''.join(self.current) if self.started and not self.done and self.depth >= 2 else None
+
+
+def iter_slides(chunks, repair=None):
+    # repair: see resolve_slides. Broken slides are repaired one at a time
+    # so the slides before them are not held back.
+    parser = SlideStreamParser()
+    parse_time = 0.0
+    index = 0
+
+    def resolve(raw):
+        slide, errors = decode_slide(raw)
+        if errors:
+            slide = resolve_slides([(index, raw, slide, errors)], repair)[index]
+        return slide
+
+    for chunk in chunks:
+        start = time.perf_counter()
+        objects = parser.feed(chunk)
+        parse_time += time.perf_counter() - start
+        for raw in objects:
+            yield resolve(raw)
+            index += 1
+
+    pending = parser.pending()
+    if pending:
+        logger.warning("Model response ended mid-slide; repairing slide %d.", index)
+        yield resolve(pending)
+        index += 1
+
+    record_duration("parse", parse_time, slides=index)
+    if index == 0:
+        raise ValueError("Expected a JSON array (list) of slides.")
@@ -0,0 +1,115 @@
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import span, submit_in_context
+
+
+DOCUMENT_TOKEN_BUDGET = 100_000  # above this the document is summarized chunk by chunk first
+CHUNK_TOKENS = 8_000
+CHUNK_OVERLAP_TOKENS = 200
+SUMMARY_WORKERS = 4
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text):
+    # Rough estimate (~4 characters per token) — good enough for budgeting
+    # without pulling in a tokenizer.
+    return (len(text) + 3) // 4
+
+
+def split_units(text, max_tokens):
+    # Pages (form feeds) and lines/paragraphs are the natural boundaries;
+    # anything still over budget is cut at sentence ends, then hard-wrapped.
+    units = []
+    for page in text.split('\f'):
+        for para in page.split('\n'):
+            para = para.strip()
+            if not para:
+                continue
+            if estimate_tokens(para) <= max_tokens:
+                units.append(para)
+                continue
+            for sentence in re.split(r'(?<=[.!?])\s+', para):
+                max_chars = max_tokens * 4
+                for start in range(0, len(sentence), max_chars):
+                    units.append(sentence[start:start + max_chars])
+    return units
+
+
+def split_text(text, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for unit in split_units(text, max_tokens):
+        unit_tokens = estimate_tokens(unit)
+        if current and current_tokens + unit_tokens > max_tokens:
+            chunks.append('\n'.join(current))
+
+            # Carry the tail of the previous chunk over for context.
+            overlap = []
+            overlap_size = 0
+            for prev in reversed(current):
+                prev_tokens = estimate_tokens(prev)
+                if overlap_size + prev_tokens > overlap_tokens:
+                    break
+                overlap.insert(0, prev)
+                overlap_size += prev_tokens
+            current = overlap
+            current_tokens = overlap_size
+
+        current.append(unit)
+        current_tokens += unit_tokens
+
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+def build_summary_prompt(chunk, index, total):
+    return f"""
+Aşağıda böyük bir sənədin {index + 1}/{total} hissəsi verilir. Bu hissənin ətraflı xülasəsini hazırla:
+- Əsas mövzuları, faktları, rəqəmləri və statistik nəticələri saxla.
+- Cədvəllərdəki və siyahılardakı dəyərləri olduğu kimi saxla.
+- Yalnız mətndəki məlumatlardan istifadə et, əlavə məlumat əlavə etmə.
+- Cavabı yalnız xülasə mətni kimi qaytar.
+
+HİSSƏNİN MƏTNİ:
+\"\"\"
+{chunk}
+\"\"\"
+"""
+
+
+def summarize_chunks(chunks, generate, max_workers=SUMMARY_WORKERS):
+    def summarize(item):
+        index, chunk = item
+        return generate(build_summary_prompt(chunk, index, len(chunks)))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summary") as executor:
+        futures = [submit_in_context(executor, summarize, item) for item in enumerate(chunks)]
+        return [future.result() for future in futures]
+
+
+def condense_text(text, generate, max_tokens=DOCUMENT_TOKEN_BUDGET, chunk_tokens=CHUNK_TOKENS,
+                  overlap_tokens=CHUNK_OVERLAP_TOKENS, max_workers=SUMMARY_WORKERS):
+    # Map-reduce: documents within budget pass through untouched, larger ones
+    # are split, summarized in parallel and the summaries merged in order.
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    with span("summarize") as record:
+        chunks = split_text(text, chunk_tokens, overlap_tokens)
+        logger.info("Document is ~%d tokens, summarizing %d chunks.", estimate_tokens(text), len(chunks))
+        summaries = summarize_chunks(chunks, generate, max_workers)
+        merged = '\n\n'.join(summary.strip() for summary in summaries)
+        record["counters"]["chunks"] = len(chunks)
+        record["counters"]["input_tokens"] = estimate_tokens(text)
+        record["counters"]["output_tokens"] = estimate_tokens(merged)
+
+    # Very large documents may need another round over the summaries.
+    if len(chunks) > 1 and len(merged) < len(text):
+        return condense_text(merged, generate, max_tokens, chunk_tokens, overlap_tokens, max_workers)
+    return merged
@@ -0,0 +1,84 @@
+import copy
+import io
+import os
+import threading
+
+from pptx import Presentation
+
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "format_new.pptx")
+
+# Layouts used by the slide builders, looked up by name with the original
+# index as fallback.
+MAIN_LAYOUT = ("CUSTOM", 12)
+VISUAL_LAYOUT = ("1/3", 3)
+# Sample slides at the end of the template that are never part of a deck.
+EXAMPLE_SLIDES = (2, 3)
+
+
+def remove_slide(prs, slide_index):
+    # Unlike delete_slide this also drops the relationship, so the slide part
+    # is left out of the saved package entirely.
+    slide_id = prs.slides._sldIdLst[slide_index]
+    prs.part.drop_rel(slide_id.rId)
+    prs.slides._sldIdLst.remove(slide_id)
+
+
+def find_layout(prs, name, fallback):
+    for index, layout in enumerate(prs.slide_layouts):
+        if layout.name == name:
+            return index
+    return fallback
+
+
+# Parses the template once per process and keeps a pristine, already
+# cleaned-up copy in memory; clone() hands out independent copies of it,
+# which is considerably cheaper than unzipping and parsing the file again.
+class Template:
+
+    def __init__(self, path=TEMPLATE_PATH):
+        self.path = path
+        prs = Presentation(path)
+        for slide_index in sorted(EXAMPLE_SLIDES, reverse=True):
+            remove_slide(prs, slide_index)
+
+        buffer = io.BytesIO()
+        prs.save(buffer)
+        self.pristine_bytes = buffer.getvalue()
+        self._pristine = Presentation(io.BytesIO(self.pristine_bytes))
+        self._lock = threading.Lock()
+
+        self.main_layout_index = find_layout(self._pristine, *MAIN_LAYOUT)
+        self.visual_layout_index = find_layout(self._pristine, *VISUAL_LAYOUT)
+
+        # Geometry of the content placeholder on the visual layout, where
+        # charts and pictures are placed.
+        layout = self._pristine.slide_layouts[self.visual_layout_index]
+        placeholder = next((ph for ph in layout.placeholders if ph.placeholder_format.idx == 1), None)
+        self.visual_box = (
+            (placeholder.left, placeholder.top, placeholder.width, placeholder.height) if placeholder else None
+        )
+
+    def clone(self):
+        # deepcopy reads lazily-initialised attributes of the pristine copy,
+        # so clones are made one at a time.
+        with self._lock:
+            return copy.deepcopy(self._pristine)
+
+    def main_layout(self, prs):
+        return prs.slide_layouts[self.main_layout_index]
+
+    def visual_layout(self, prs):
+        return prs.slide_layouts[self.visual_layout_index]
+
+
+_template = None
+_template_lock = threading.Lock()
+
+
+def get_template():
+    global _template
+    with _template_lock:
+        if _template is None:
+            _template = Template()
+    return _template
@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import time
+
+from utils.cache import CACHE_DIR, DiskCache, cache_key
+from utils.metrics import span
+
+
+TRANSLATION_CACHE_BYTES = 16 * 1024 * 1024
+# Single translate() calls arriving within this many seconds of each other
+# (image jobs of a streamed deck) share one backend round trip.
+TRANSLATION_BATCH_WINDOW = float(os.environ.get("PPTX_TRANSLATION_BATCH_WINDOW", 0.2))
+
+logger = logging.getLogger(__name__)
+
+_translator = None
+_translator_lock = threading.Lock()
+
+
+# Translator backends take a list of texts and return their translations in
+# the same order.
+def google_translate(texts, src, dest):
+    # One Translator (and its HTTP client) per process. googletrans isn't
+    # thread-safe, so calls on it are serialized.
+    global _translator
+    with _translator_lock:
+        if _translator is None:
+            from googletrans import Translator
+
+            _translator = Translator()
+        translated = _translator.translate(list(texts), src=src, dest=dest)
+    return [item.text for item in translated]
+
+
+def identity_translate(texts, src, dest):
+    # Offline fallback: pass the text through untouched.
+    return list(texts)
+
+
+BACKENDS = {
+    "google": google_translate,
+    "none": identity_translate,
+}
+
+
+# az -> en translation with an in-process memo in front of a persistent
+# on-disk one, so a phrase is only ever sent to the backend once.
+class TranslationService:
+
+    def __init__(self, backend=None, cache=None, src='az', dest='en', batch_window=TRANSLATION_BATCH_WINDOW):
+        self.backend = backend or BACKENDS[os.environ.get("TRANSLATOR", "google")]
+        self.cache = cache
+        self.src = src
+        self.dest = dest
+        self.batch_window = batch_window
+        self._memo = {}
+        self._lock = threading.Lock()
+        self._batch = None
+
+    def key(self, text):
+        return cache_key(self.src, self.dest, text)
+
+    def lookup(self, text):
+        with self._lock:
+            if text in self._memo:
+                return self._memo[text]
+        if self.cache is not None:
+            cached = self.cache.get(self.key(text))
+            if cached is not None:
+                translated = cached.decode("utf-8")
+                with self._lock:
+                    self._memo[text] = translated
+                return translated
+        return None
+
+    def store(self, text, translated):
+        with self._lock:
+            self._memo[text] = translated
+        if self.cache is not None:
+            self.cache.set(self.key(text), translated.encode("utf-8"))
+
+    def translate_many(self, texts):
+        results = {"": ""}
+        missing = []
+        for text in texts:
+            if text in results or text in missing:
+                continue
+            translated = self.lookup(text)
+            if translated is None:
+                missing.append(text)
+            else:
+                results[text] = translated
+
+        if missing:
+            with span("translation_backend", texts=len(missing)) as record:
+                translations = self.backend(missing, self.src, self.dest)
+                record["counters"]["chars"] = sum(len(text) for text in missing)
+            for text, translated in zip(missing, translations):
+                self.store(text, translated)
+                results[text] = translated
+
+        return [results[text] for text in texts]
+
+    def translate(self, text):
+        # The first caller to miss the memo opens a batch, waits batch_window
+        # for other misses to join it, then translates them all in one call.
+        translated = self.lookup(text)
+        if translated is not None:
+            return translated
+        if not self.batch_window:
+            return self.translate_many([text])[0]
+
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = {"texts": [], "done": threading.Event(), "results": None, "error": None}
+            if text not in batch["texts"]:
+                batch["texts"].append(text)
+
+        if not leader:
+            batch["done"].wait()
+            if batch["error"] is not None:
+                raise batch["error"]
+            return batch["results"][text]
+
+        time.sleep(self.batch_window)
+        with self._lock:
+            self._batch = None
+        try:
+            batch["results"] = dict(zip(batch["texts"], self.translate_many(batch["texts"])))
+            return batch["results"][text]
+        except BaseException as e:
+            batch["error"] = e
+            raise
+        finally:
+            batch["done"].set()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_translation_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            cache = DiskCache(os.path.join(CACHE_DIR, "translations"), max_bytes=TRANSLATION_CACHE_BYTES, suffix=".txt")
+            _service = TranslationService(cache=cache)
+    return _service
@@ -0,0 +1,155 @@
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+from collections import Counter
+
+import numpy as np
+
+from utils.metrics import span
+
+
+# Pre-built index of reusable icons and stock pictures (see
+# build_visual_index.py). Image slides whose description matches an entry
+# at least this well use the stock picture instead of a diffusion call.
+VISUAL_INDEX_DIR = os.environ.get("PPTX_VISUAL_INDEX", "visual_index")
+VISUAL_MATCH_THRESHOLD = float(os.environ.get("PPTX_VISUAL_THRESHOLD", 0.35))
+LIBRARY_EXTENSIONS = (".png", ".jpg", ".jpeg")
+STEM_CHARS = 5  # crude stemming for Azerbaijani suffixes: "texnologiyalar" ~ "texno"
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+logger = logging.getLogger(__name__)
+
+
+def terms(text):
+    words = [word for word in WORD.findall(text.lower()) if len(word) > 2 and not word.isdigit()]
+    return words + [word[:STEM_CHARS] + "~" for word in words if len(word) > STEM_CHARS]
+
+
+def weights(term_counts, idf):
+    # Sublinear tf-idf, L2-normalised: {term: weight}.
+    vector = {term: (1 + math.log(count)) * idf[term] for term, count in term_counts.items() if term in idf}
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {term: weight / norm for term, weight in vector.items()}
+
+
+def read_caption(path):
+    # <name>.txt next to the picture, else the file name itself.
+    caption_path = os.path.splitext(path)[0] + ".txt"
+    if os.path.exists(caption_path):
+        with open(caption_path, encoding="utf-8") as f:
+            return f.read().strip()
+    return re.sub(r'[_\-.]+', ' ', os.path.splitext(os.path.basename(path))[0])
+
+
+def build_index(library_dir, out_dir):
+    # Offline step. The index is an inverted list of (item, weight) per term
+    # stored as flat .npy arrays, so it can be memory-mapped rather than
+    # loaded.
+    items = []
+    for root, _, files in os.walk(library_dir):
+        for name in sorted(files):
+            if name.lower().endswith(LIBRARY_EXTENSIONS):
+                path = os.path.join(root, name)
+                items.append({"path": os.path.relpath(path, library_dir), "caption": read_caption(path)})
+    items.sort(key=lambda item: item["path"])
+
+    counts = [Counter(terms(item["caption"])) for item in items]
+    document_frequency = Counter()
+    for term_counts in counts:
+        document_frequency.update(term_counts.keys())
+    vocabulary = sorted(document_frequency)
+    idf = {term: math.log((1 + len(items)) / (1 + document_frequency[term])) + 1 for term in vocabulary}
+
+    postings = {term: [] for term in vocabulary}
+    for item_id, term_counts in enumerate(counts):
+        for term, weight in weights(term_counts, idf).items():
+            postings[term].append((item_id, weight))
+
+    indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    for term_id, term in enumerate(vocabulary):
+        indptr[term_id + 1] = indptr[term_id] + len(postings[term])
+    item_ids = np.fromiter((item_id for term in vocabulary for item_id, _ in postings[term]), dtype=np.int32)
+    item_weights = np.fromiter((weight for term in vocabulary for _, weight in postings[term]), dtype=np.float32)
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "indptr.npy"), indptr)
+    np.save(os.path.join(out_dir, "items.npy"), item_ids)
+    np.save(os.path.join(out_dir, "weights.npy"), item_weights)
+    np.save(os.path.join(out_dir, "idf.npy"), np.asarray([idf[term] for term in vocabulary], dtype=np.float32))
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"library": os.path.abspath(library_dir), "vocabulary": vocabulary, "items": items},
+                  f, ensure_ascii=False)
+    return len(items), len(vocabulary)
+
+
+class VisualIndex:
+
+    def __init__(self, directory, threshold=VISUAL_MATCH_THRESHOLD):
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.library = meta["library"]
+        self.items = meta["items"]
+        self.term_ids = {term: i for i, term in enumerate(meta["vocabulary"])}
+        # Posting lists stay on disk; the OS pages in what queries touch.
+        self.indptr = np.load(os.path.join(directory, "indptr.npy"), mmap_mode="r")
+        self.item_ids = np.load(os.path.join(directory, "items.npy"), mmap_mode="r")
+        self.item_weights = np.load(os.path.join(directory, "weights.npy"), mmap_mode="r")
+        idf = np.load(os.path.join(directory, "idf.npy"), mmap_mode="r")
+        self.idf = {term: float(idf[i]) for term, i in self.term_ids.items()}
+        self.threshold = threshold
+
+    def search(self, text, k=1):
+        # [(cosine similarity, item)] for the k best matches.
+        query = weights(Counter(terms(text)), self.idf)
+        scores = np.zeros(len(self.items), dtype=np.float32)
+        for term, weight in query.items():
+            term_id = self.term_ids[term]
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            scores[self.item_ids[start:end]] += weight * self.item_weights[start:end]
+        if not len(scores):
+            return []
+        best = np.argsort(scores)[::-1][:k]
+        return [(float(scores[i]), self.items[i]) for i in best if scores[i] > 0]
+
+    def match(self, text):
+        # Path of the stock picture for text, or None below the threshold.
+        with span("visual_lookup") as record:
+            results = self.search(text)
+            score, item = results[0] if results else (0.0, None)
+            record["attributes"]["score"] = score
+            record["counters"]["hits"] = int(score >= self.threshold)
+        if item is None or score < self.threshold:
+            return None
+        logger.info("Stock visual %s matched (%.2f).", item["path"], score)
+        return os.path.join(self.library, item["path"])
+
+    def resolve(self, text, output_path):
+        # Copies the matching picture to output_path; False if none matched.
+        path = self.match(text)
+        if path is None:
+            return False
+        shutil.copyfile(path, output_path)
+        return True
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_visual_index():
+    # None when no index has been built; image slides then always go to
+    # the diffusion model.
+    global _index, _index_loaded
+    with _index_lock:
+        if not _index_loaded:
+            _index_loaded = True
+            if os.path.exists(os.path.join(VISUAL_INDEX_DIR, "meta.json")):
+                _index = VisualIndex(VISUAL_INDEX_DIR)
+                logger.info("Loaded visual index with %d pictures.", len(_index.items))
+    return _index